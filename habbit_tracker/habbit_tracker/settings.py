@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'habits.metrics.MetricsMiddleware',
+    'habits.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -117,6 +119,11 @@ DATABASES = {
     )
 }
 
+# Проверка достижений после отметки: True - в фоновом потоке, False - в том же
+# запросе. None выбирает по БД: фоновый поток на PostgreSQL, синхронно на SQLite,
+# где поток конкурировал бы с запросами за блокировку базы
+ACHIEVEMENTS_ASYNC = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -153,3 +160,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Логи приложения: медленные запросы (habits.profiling), ошибки фоновых задач
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'habits': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
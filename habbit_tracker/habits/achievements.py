@@ -0,0 +1,126 @@
+"""
+Отложенная проверка достижений после коммита транзакции.
+
+На PostgreSQL проверка по умолчанию выполняется в фоновом потоке процесса
+и не добавляет задержку к запросу. На SQLite поток конкурировал бы с
+запросами за блокировку базы, поэтому там проверка выполняется синхронно
+в колбэке on_commit того же запроса. ACHIEVEMENTS_ASYNC=True/False
+задает режим явно.
+"""
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from .models import Achievement, AchievementThreshold, Habit
+import atexit
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def evaluate_achievements(habit_ids):
+    """Проверяет достижения пачки привычек: один запрос на чтение и один на вставку"""
+    thresholds = AchievementThreshold.get_map()
+    habits = Habit.objects.filter(
+        pk__in=habit_ids, current_streak__in=list(thresholds)
+    ).only('id', 'user_id', 'name', 'current_streak')
+    return Achievement.create_for_habits(habits)
+
+
+class AchievementWorker:
+    """
+    Фоновый поток, проверяющий достижения вне запроса пользователя.
+
+    Все привычки, накопившиеся в очереди к моменту проверки,
+    обрабатываются одной пачкой. При завершении процесса stop() дожидается
+    обработки очереди; проверки, не успевшие выполниться за timeout,
+    восстанавливает backfill_achievements.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, habit_ids):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='achievements', daemon=True)
+                self.thread.start()
+        self.queue.put(habit_ids)
+
+    def stop(self, timeout=10):
+        with self.lock:
+            thread = self.thread
+        if thread is None or not thread.is_alive():
+            return
+        # None - сигнал остановки после уже поставленных в очередь пачек
+        self.queue.put(None)
+        thread.join(timeout)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            habit_ids = set()
+            item = self.queue.get()
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    habit_ids.update(item)
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if not habit_ids:
+                continue
+            try:
+                evaluate_achievements(habit_ids)
+            except Exception:
+                logger.exception('Ошибка при проверке достижений')
+            finally:
+                close_old_connections()
+
+
+worker = AchievementWorker()
+atexit.register(worker.stop)
+
+
+def achievements_async():
+    """Проверять ли достижения в фоновом потоке: по настройке или по типу БД"""
+    value = getattr(settings, 'ACHIEVEMENTS_ASYNC', None)
+    if value is None:
+        return connection.vendor == 'postgresql'
+    return value
+
+
+def _pending():
+    if not hasattr(_local, 'habit_ids'):
+        _local.habit_ids = set()
+    return _local.habit_ids
+
+
+def _flush():
+    habit_ids = _pending()
+    if not habit_ids:
+        return
+    _local.habit_ids = set()
+
+    if achievements_async():
+        worker.submit(habit_ids)
+    else:
+        evaluate_achievements(habit_ids)
+
+
+def schedule_achievement_check(habit_id):
+    """
+    Откладывает проверку достижений привычки до коммита транзакции.
+
+    Все привычки, отмеченные до коммита, проверяются одной пачкой;
+    колбэки после первого находят пустой набор и ничего не делают.
+    """
+    _pending().add(habit_id)
+    transaction.on_commit(_flush)
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import Habit, HabitLog
+from .models import AchievementThreshold, Habit, HabitLog
 
 @admin.register(Habit)
 class HabitAdmin(admin.ModelAdmin):
-    list_display = ['name', 'user', 'frequency', 'target', 'is_active']
+    list_display = ['name', 'user', 'frequency', 'target', 'is_active', 'current_streak', 'best_streak']
     list_filter = ['frequency', 'is_active']
     search_fields = ['name', 'description']
 
@@ -11,4 +11,8 @@ class HabitAdmin(admin.ModelAdmin):
 class HabitLogAdmin(admin.ModelAdmin):
     list_display = ['habit', 'date', 'completed']
     list_filter = ['date', 'completed']
-    date_hierarchy = 'date'
\ No newline at end of file
+    date_hierarchy = 'date'
+
+@admin.register(AchievementThreshold)
+class AchievementThresholdAdmin(admin.ModelAdmin):
+    list_display = ['streak_length', 'title']
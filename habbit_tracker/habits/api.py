@@ -4,16 +4,25 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-from .models import Habit, HabitLog
+from .models import DailyStats, Habit, HabitLog, Tombstone
 from .models import Achievement
 from .social_forms import AchievementPostForm
+from .timeline import HabitTimeline, parse_days
+from .bulk import MAX_BULK_LOGS, upsert_logs
+from .sync import collect_changes, parse_token
+from .response_cache import cached_response, conditional_response
 from .serializers import (
     HabitSerializer, HabitLogSerializer,
     HabitStatisticsSerializer, DailyCompletionSerializer,
-    UserSerializer
+    UserSerializer, BulkHabitLogSerializer, SyncHabitLogSerializer,
+    AchievementSerializer, parse_fields, parse_log_embedding, embedded_logs_queryset
 )
 
 
@@ -97,7 +106,34 @@ class HabitViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Habit.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Habit.objects.filter(
+            user=self.request.user
+        ).select_related('user').order_by('-created_at')
+
+        if self.action in ('list', 'retrieve'):
+            fields = parse_fields(self.request)
+            if fields is None or 'completion_rate' in fields:
+                queryset = queryset.with_log_stats()
+
+            log_embedding = parse_log_embedding(self.request)
+            if log_embedding is not None:
+                since, limit = log_embedding
+                queryset = queryset.prefetch_related(Prefetch(
+                    'logs',
+                    queryset=embedded_logs_queryset(since)[:limit],
+                    to_attr='embedded_logs'
+                ))
+
+        return queryset
+
+    @conditional_response('habits')
+    @cached_response('habits')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response('habit')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=True, methods=['post'])
     def log_today(self, request, pk=None):
@@ -112,6 +148,8 @@ class HabitViewSet(viewsets.ModelViewSet):
         )
 
         if not created:
+            # Привычка уже загружена, save не будет читать ее заново
+            log.habit = habit
             log.completed = not log.completed
             log.save()
 
@@ -119,129 +157,150 @@ class HabitViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
+    @conditional_response('statistics')
+    @cached_response('statistics')
     def statistics(self, request, pk=None):
         """Получить статистику по привычке"""
         habit = self.get_object()
 
-        # Данные за 30 дней
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=30)
-
-        logs = HabitLog.objects.filter(
-            habit=habit,
-            date__range=[start_date, end_date]
-        ).order_by('date')
-
-        # Подготовка данных для графика
-        daily_data = []
-        current_date = start_date
-        current_streak = 0
-
-        while current_date <= end_date:
-            log = logs.filter(date=current_date).first()
-            completed = log.completed if log else False
-
-            if completed:
-                current_streak += 1
-            else:
-                current_streak = 0
-
-            daily_data.append({
-                'date': current_date,
-                'completed': completed,
-                'streak': current_streak
-            })
-
-            current_date += timedelta(days=1)
-
-        # Лучшая серия
-        streaks = []
-        current_streak = 0
-        for day in daily_data:
-            if day['completed']:
-                current_streak += 1
-            else:
-                if current_streak > 0:
-                    streaks.append(current_streak)
-                current_streak = 0
-
-        if current_streak > 0:
-            streaks.append(current_streak)
-
-        best_streak = max(streaks) if streaks else 0
+        # Данные за последние N дней (по умолчанию 30) одним запросом
+        timeline = HabitTimeline(habit, days=parse_days(request.query_params.get('days')))
 
         # Подготовка ответа
         stats = {
             'habit_id': habit.id,
             'name': habit.name,
-            'current_streak': habit.get_current_streak(),
-            'completion_rate': habit.get_completion_percentage(),
-            'total_completed': habit.logs.filter(completed=True).count(),
-            'best_streak': best_streak,
-            'daily_data': daily_data[-7:],  # Последние 7 дней
+            'current_streak': habit.current_streak,
+            'completion_rate': timeline.completion_rate,
+            'total_completed': habit.completed_logs_count(),
+            'best_streak': timeline.best_streak,
+            'daily_data': timeline.daily_data()[-7:],  # Последние 7 дней
         }
 
         serializer = HabitStatisticsSerializer(stats)
         return Response(serializer.data)
 
 
+class HabitLogCursorPagination(CursorPagination):
+    """Курсорная пагинация логов без COUNT(*) и OFFSET"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-date', '-id')
+
+
 class HabitLogViewSet(viewsets.ModelViewSet):
-    """ViewSet для отметок выполнения"""
+    """
+    ViewSet для отметок выполнения.
+
+    Фильтры: habit, date_after, date_before (включительно), completed.
+    """
     serializer_class = HabitLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HabitLogCursorPagination
 
     def get_queryset(self):
-        return HabitLog.objects.filter(habit__user=self.request.user)
+        queryset = HabitLog.objects.filter(habit__user=self.request.user)
+        params = self.request.query_params
+
+        habit_id = params.get('habit')
+        if habit_id:
+            if not habit_id.isdigit():
+                raise ValidationError({'habit': 'Ожидается ID привычки'})
+            queryset = queryset.filter(habit_id=habit_id)
+
+        for param, lookup in (('date_after', 'date__gte'), ('date_before', 'date__lte')):
+            value = params.get(param)
+            if value:
+                date = parse_date(value)
+                if date is None:
+                    raise ValidationError({param: 'Ожидается дата в формате YYYY-MM-DD'})
+                queryset = queryset.filter(**{lookup: date})
+
+        completed = params.get('completed')
+        if completed:
+            if completed.lower() not in ('true', 'false', '1', '0'):
+                raise ValidationError({'completed': 'Ожидается true или false'})
+            queryset = queryset.filter(completed=completed.lower() in ('true', '1'))
+
+        return queryset
+
+    @conditional_response('logs')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response('log')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         habit_id = self.request.data.get('habit')
         habit = get_object_or_404(Habit, id=habit_id, user=self.request.user)
         serializer.save(habit=habit)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Пакетная запись отметок (например, после офлайна)"""
+        serializer = BulkHabitLogSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=MAX_BULK_LOGS
+        )
+        serializer.is_valid(raise_exception=True)
+
+        logs, foreign_ids = upsert_logs(request.user, serializer.validated_data)
+        if foreign_ids:
+            raise ValidationError({'habit': f'Привычки не найдены: {foreign_ids}'})
+
+        return Response(HabitLogSerializer(logs, many=True).data)
+
 
 class DashboardAPIView(generics.GenericAPIView):
     """API для дашборда"""
     permission_classes = [IsAuthenticated]
 
+    @conditional_response('dashboard')
+    @cached_response('dashboard')
     def get(self, request):
-        habits = Habit.objects.filter(user=request.user, is_active=True)
+        habits = Habit.objects.filter(
+            user=request.user, is_active=True
+        ).with_log_stats().order_by('pk')
 
         stats = []
         total_completion = 0
 
         for habit in habits:
             completion_rate = habit.get_completion_percentage()
-            current_streak = habit.get_current_streak()
 
             stats.append({
                 'id': habit.id,
                 'name': habit.name,
                 'completion_rate': completion_rate,
-                'current_streak': current_streak,
-                'total_logs': habit.logs.count(),
-                'total_completed': habit.logs.filter(completed=True).count(),
+                'current_streak': habit.current_streak,
+                'total_logs': habit.total_logs,
+                'total_completed': habit.total_completed,
             })
 
             total_completion += completion_rate
 
         average_completion = round(total_completion / len(stats)) if stats else 0
 
-        # Ежедневная статистика (последние 7 дней)
+        # Ежедневная статистика (последние 7 дней) из дневных сводок
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=7)
 
+        completed_by_date = dict(
+            DailyStats.objects.filter(
+                user=request.user,
+                date__range=[start_date, start_date + timedelta(days=6)]
+            ).values_list('date', 'completed_habits')
+        )
+
         daily_stats = []
         for i in range(7):
             date = start_date + timedelta(days=i)
-            daily_logs = HabitLog.objects.filter(
-                habit__user=request.user,
-                date=date,
-                completed=True
-            )
             daily_stats.append({
                 'date': date,
-                'completed_habits': daily_logs.count(),
-                'total_habits': habits.count(),
+                'completed_habits': completed_by_date.get(date, 0),
+                'total_habits': len(stats),
             })
 
         return Response({
@@ -252,4 +311,40 @@ class DashboardAPIView(generics.GenericAPIView):
                 'total_completed_logs': sum(s['total_completed'] for s in stats),
             },
             'daily_stats': daily_stats,
-        })
\ No newline at end of file
+        })
+
+
+class SyncAPIView(generics.GenericAPIView):
+    """
+    Дельта-синхронизация: изменения и удаления с момента ?since=<token>.
+
+    Без since отдается полная выгрузка. Новый token нужно передать
+    в следующем запросе, reset=true означает замену локальных данных.
+    Отметки и достижения удаленной привычки в deleted не перечисляются,
+    клиент удаляет их вместе с привычкой.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        since = None
+        token = request.query_params.get('since')
+        if token:
+            since = parse_token(token)
+            if since is None:
+                raise ValidationError({'since': 'Некорректный токен синхронизации'})
+
+        changes = collect_changes(request.user, since)
+        deleted = changes['deleted']
+
+        return Response({
+            'token': changes['token'],
+            'reset': changes['reset'],
+            'habits': HabitSerializer(changes['habits'], many=True, context={'request': request}).data,
+            'logs': SyncHabitLogSerializer(changes['logs'], many=True).data,
+            'achievements': AchievementSerializer(changes['achievements'], many=True).data,
+            'deleted': {
+                'habits': deleted[Tombstone.HABIT],
+                'logs': deleted[Tombstone.LOG],
+                'achievements': deleted[Tombstone.ACHIEVEMENT],
+            },
+        })
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 from .api import (
     HabitViewSet, HabitLogViewSet,
-    DashboardAPIView, CustomAuthToken
+    DashboardAPIView, SyncAPIView, CustomAuthToken
 )
 
 router = DefaultRouter()
@@ -13,6 +13,7 @@ router.register(r'logs', HabitLogViewSet, basename='log')
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', DashboardAPIView.as_view(), name='api_dashboard'),
+    path('sync/', SyncAPIView.as_view(), name='api_sync'),
     path('auth/token/', CustomAuthToken.as_view(), name='api_token_auth'),
     path('auth/', include('rest_framework.urls')),  # Session authentication
 ]
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""Чтение отметок за диапазон дат из годовых битовых карт"""
+from datetime import date as date_type, timedelta
+from .models import HabitYearBitmap
+
+
+class DayBits:
+    """
+    Отметки за диапазон дат: бит i соответствует start_date + i дней.
+
+    Количество выполнений считается через popcount,
+    серии - сдвигами по битам, без обхода дней.
+    """
+
+    def __init__(self, start_date, length, completed, marked):
+        self.start_date = start_date
+        self.length = length
+        self.completed = completed
+        self.marked = marked
+
+    def is_completed(self, index):
+        return bool(self.completed >> index & 1)
+
+    def is_marked(self, index):
+        return bool(self.marked >> index & 1)
+
+    def count_completed(self):
+        return self.completed.bit_count()
+
+    def longest_run(self):
+        """Самая длинная серия выполненных дней подряд"""
+        bits = self.completed
+        run = 0
+        while bits:
+            bits &= bits >> 1
+            run += 1
+        return run
+
+    def trailing_run(self):
+        """Серия выполненных дней, заканчивающаяся последним днем диапазона"""
+        full = (1 << self.length) - 1
+        missing = ~self.completed & full
+        if not missing:
+            return self.length
+        return self.length - missing.bit_length()
+
+
+def load_day_bits(habit, start_date, end_date):
+    """Отметки привычки за [start_date, end_date] одним запросом к битовым картам"""
+    length = (end_date - start_date).days + 1
+    completed = 0
+    marked = 0
+
+    bitmaps = HabitYearBitmap.objects.filter(
+        habit=habit,
+        year__range=[start_date.year, end_date.year]
+    ).values_list('year', 'completed', 'marked')
+
+    for year, year_completed, year_marked in bitmaps:
+        # Пересечение диапазона с годом и сдвиг на его позицию в диапазоне
+        first = max(start_date, date_type(year, 1, 1))
+        last = min(end_date, date_type(year, 12, 31))
+        first_index = HabitYearBitmap.day_index(first)
+        mask = (1 << (last - first).days + 1) - 1
+        offset = (first - start_date).days
+
+        completed |= (HabitYearBitmap.to_int(year_completed) >> first_index & mask) << offset
+        marked |= (HabitYearBitmap.to_int(year_marked) >> first_index & mask) << offset
+
+    return DayBits(start_date, length, completed, marked)
+
+
+def iter_days(day_bits):
+    """Дни диапазона с признаками (date, marked, completed)"""
+    for index in range(day_bits.length):
+        yield (
+            day_bits.start_date + timedelta(days=index),
+            day_bits.is_marked(index),
+            day_bits.is_completed(index),
+        )
@@ -0,0 +1,52 @@
+"""Пакетная запись отметок для офлайн-клиентов"""
+from django.db import transaction
+from .achievements import schedule_achievement_check
+from .models import DailyStats, Habit, HabitLog, HabitYearBitmap, UserDataVersion
+
+MAX_BULK_LOGS = 1000
+
+
+def upsert_logs(user, entries):
+    """
+    Создает или обновляет отметки пачкой по ключу (habit, date).
+
+    entries - провалидированные словари habit/date/completed/notes,
+    при повторе дня побеждает последняя запись. Серии, битовые карты,
+    дневные сводки и достижения пересчитываются один раз на привычку.
+    Возвращает (сохраненные отметки, ID чужих или несуществующих привычек).
+    """
+    by_key = {(entry['habit'], entry['date']): entry for entry in entries}
+    requested_ids = {habit_id for habit_id, _ in by_key}
+
+    # Проверяем владение всеми привычками одним запросом
+    habits = {habit.pk: habit for habit in Habit.objects.filter(user=user, pk__in=requested_ids)}
+    foreign_ids = requested_ids - set(habits)
+    if foreign_ids:
+        return [], sorted(foreign_ids)
+
+    with transaction.atomic():
+        HabitLog.objects.bulk_create(
+            [
+                HabitLog(habit_id=habit_id, date=date, completed=entry['completed'], notes=entry['notes'])
+                for (habit_id, date), entry in by_key.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['habit', 'date'],
+            update_fields=['completed', 'notes', 'updated_at'],
+        )
+
+        for habit in habits.values():
+            habit.rebuild_streak_state()
+        HabitYearBitmap.set_days({key: entry['completed'] for key, entry in by_key.items()})
+        DailyStats.refresh_days(user, {date for _, date in by_key})
+        UserDataVersion.bump_on_commit(user.pk)
+
+        # Достижения всех привычек проверяются одной пачкой после коммита
+        for habit_id in habits:
+            schedule_achievement_check(habit_id)
+
+    logs = HabitLog.objects.filter(
+        habit_id__in=habits,
+        date__in={date for _, date in by_key}
+    ).order_by('habit_id', 'date')
+    return [log for log in logs if (log.habit_id, log.date) in by_key], []
@@ -0,0 +1,83 @@
+"""Пакетная отправка писем через переиспользуемые SMTP-соединения"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.mail import get_connection
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def delivery_settings():
+    """Параметры рассылки из настроек Django с значениями по умолчанию"""
+    return {
+        'workers': getattr(settings, 'REMINDER_EMAIL_WORKERS', 4),
+        'batch_size': getattr(settings, 'REMINDER_EMAIL_BATCH_SIZE', 50),
+        'max_attempts': getattr(settings, 'REMINDER_EMAIL_MAX_ATTEMPTS', 3),
+        'backoff': getattr(settings, 'REMINDER_EMAIL_RETRY_BACKOFF', 1.0),
+    }
+
+
+def send_batch(messages, max_attempts=3, backoff=1.0, sleep=time.sleep, failures=None):
+    """
+    Отправляет пачку писем через одно соединение.
+
+    Каждое письмо повторяется до max_attempts раз с экспоненциальной
+    задержкой, после ошибки соединение открывается заново. Неотправленные
+    письма добавляются в failures, если список передан.
+    Возвращает (отправлено, не отправлено).
+    """
+    connection = get_connection(fail_silently=False)
+    sent = 0
+    failed = 0
+
+    try:
+        for message in messages:
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    connection.open()
+                    message.connection = connection
+                    connection.send_messages([message])
+                    sent += 1
+                    break
+                except Exception as e:
+                    connection.close()
+                    if attempt == max_attempts:
+                        failed += 1
+                        if failures is not None:
+                            failures.append(message)
+                        logger.error(f'Не удалось отправить письмо {message.to}: {e}')
+                    else:
+                        sleep(backoff * 2 ** (attempt - 1))
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def deliver_messages(messages, workers=None, batch_size=None, max_attempts=None, backoff=None, failures=None):
+    """
+    Рассылает письма пачками по batch_size в пуле из workers потоков.
+
+    Каждый поток держит свое соединение на время пачки.
+    Возвращает (отправлено, не отправлено).
+    """
+    options = delivery_settings()
+    workers = workers or options['workers']
+    batch_size = batch_size or options['batch_size']
+    max_attempts = max_attempts or options['max_attempts']
+    backoff = options['backoff'] if backoff is None else backoff
+
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+    if not batches:
+        return 0, 0
+
+    if len(batches) == 1 or workers == 1:
+        results = [send_batch(batch, max_attempts, backoff, failures=failures) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            results = list(executor.map(
+                lambda batch: send_batch(batch, max_attempts, backoff, failures=failures), batches
+            ))
+
+    return sum(sent for sent, _ in results), sum(failed for _, failed in results)
@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from habits.models import Achievement, AchievementThreshold, Habit, HabitLog, PublicAchievementCounter
+from habits.streaks import calculate_streak_state
+from itertools import groupby
+from pathlib import Path
+import multiprocessing
+import os
+import time
+
+
+def process_chunk(args):
+    """
+    Достижения для привычек с ID из (start, end] по всей истории отметок.
+
+    Отметки пачки читаются одним запросом, отсортированными по привычке
+    и дате; каждая привычка проходится один раз. Достижение положено
+    за каждый порог, не превышающий лучшую серию.
+    Возвращает (конец пачки, новых достижений).
+    """
+    start, end, thresholds, dry_run = args
+
+    habits = {
+        habit.pk: habit
+        for habit in Habit.objects.filter(pk__gt=start, pk__lte=end).only('id', 'user_id', 'name')
+    }
+    existing = set(
+        Achievement.objects.filter(habit_id__gt=start, habit_id__lte=end).values_list('habit_id', 'streak_length')
+    )
+
+    logs = HabitLog.objects.filter(habit_id__gt=start, habit_id__lte=end).order_by('habit_id', 'date').values_list(
+        'habit_id', 'date', 'completed'
+    )
+    achievements = []
+    for habit_id, rows in groupby(logs.iterator(chunk_size=5000), key=lambda row: row[0]):
+        best_streak = calculate_streak_state(row[1:] for row in rows)['best_streak']
+        achievements.extend(
+            Achievement.for_streak(habits[habit_id], length, title)
+            for length, title in thresholds.items()
+            if length <= best_streak and (habit_id, length) not in existing
+        )
+
+    if achievements and not dry_run:
+        Achievement.objects.bulk_create(achievements, batch_size=1000, ignore_conflicts=True)
+        PublicAchievementCounter.refresh_users({achievement.user_id for achievement in achievements})
+    return end, len(achievements)
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие достижения по всей истории отметок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Число процессов')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Привычек в одной пачке')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не записывать')
+        parser.add_argument('--checkpoint', help='Файл, куда записывается ID последней обработанной привычки')
+        parser.add_argument('--resume', action='store_true', help='Продолжить с ID из файла --checkpoint')
+
+    def handle(self, *args, **options):
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+        if options['resume'] and checkpoint is None:
+            raise CommandError('Для --resume нужен --checkpoint')
+
+        start_after = 0
+        if options['resume'] and checkpoint.exists():
+            start_after = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f'Продолжаем после привычки {start_after}')
+
+        thresholds = AchievementThreshold.get_map()
+        dry_run = options['dry_run']
+        workers = max(options['workers'], 1)
+        last_id = Habit.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        chunk_size = options['chunk_size']
+        # Пачки - диапазоны ID, поэтому родителю не нужно читать все привычки
+        chunks = (
+            (start, min(start + chunk_size, last_id), thresholds, dry_run)
+            for start in range(start_after, last_id, chunk_size)
+        )
+
+        started = time.perf_counter()
+        habits_done = start_after
+        created = 0
+
+        if workers == 1:
+            results = map(process_chunk, chunks)
+            pool = None
+        else:
+            # Рабочие процессы создаются через fork и наследуют настроенный Django:
+            # при spawn/forkserver импорт моделей в дочернем процессе опередил бы
+            # django.setup(). Соединения родителя закрыты, дочерние откроют свои
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            # imap отдает результаты по порядку пачек, поэтому контрольная
+            # точка никогда не обгоняет необработанные привычки
+            results = pool.imap(process_chunk, chunks)
+
+        try:
+            for end, count in results:
+                habits_done = end
+                created += count
+                if checkpoint is not None and not dry_run:
+                    checkpoint.write_text(str(end))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        action = 'Будет создано' if dry_run else 'Создано'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} достижений: {created} (до привычки {habits_done}, '
+            f'{time.perf_counter() - started:.1f} с)'
+        ))
+
@@ -0,0 +1,94 @@
+from django.core.mail import EmailMessage, send_mail
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from habits.mailer import deliver_messages
+import json
+import socket
+import time
+
+
+class CountingHandler:
+    """Обработчик aiosmtpd, который только считает принятые письма"""
+
+    def __init__(self):
+        self.count = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.count += 1
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность рассылки на локальном SMTP-сервере '
+        '(нужен пакет aiosmtpd: pip install aiosmtpd)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Писем в каждом прогоне')
+        parser.add_argument('--workers', type=int, nargs='*', default=[1, 4, 8], help='Размеры пула')
+        parser.add_argument('--batch-size', type=int, default=50, help='Писем на одно соединение')
+        parser.add_argument('--skip-baseline', action='store_true',
+                            help='Не замерять отправку с отдельным соединением на каждое письмо')
+
+    def handle(self, *args, **options):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError('Для бенчмарка нужен aiosmtpd: pip install aiosmtpd')
+
+        handler = CountingHandler()
+        port = free_port()
+        controller = Controller(handler, hostname='127.0.0.1', port=port)
+        controller.start()
+
+        count = options['messages']
+        results = []
+
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=port,
+                EMAIL_USE_TLS=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD='',
+            ):
+                if not options['skip_baseline']:
+                    # Прежняя схема: send_mail с новым соединением на каждое письмо
+                    started = time.perf_counter()
+                    for i in range(count):
+                        send_mail('Бенчмарк', 'Текст', 'bench@example.com', [f'user{i}@example.com'])
+                    results.append(self.result('send_mail', count, count, 0, started))
+
+                for workers in options['workers']:
+                    messages = [
+                        EmailMessage('Бенчмарк', 'Текст', 'bench@example.com', [f'user{i}@example.com'])
+                        for i in range(count)
+                    ]
+                    started = time.perf_counter()
+                    sent, failed = deliver_messages(
+                        messages, workers=workers, batch_size=options['batch_size'], backoff=0
+                    )
+                    results.append(self.result(f'pool_{workers}', count, sent, failed, started))
+        finally:
+            controller.stop()
+
+        self.stdout.write(json.dumps({'received': handler.count, 'runs': results}, indent=2))
+
+    def result(self, name, count, sent, failed, started):
+        elapsed = time.perf_counter() - started
+        return {
+            'name': name,
+            'messages': count,
+            'sent': sent,
+            'failed': failed,
+            'seconds': round(elapsed, 3),
+            'messages_per_second': round(count / elapsed, 1) if elapsed else None,
+        }
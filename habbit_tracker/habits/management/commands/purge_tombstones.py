@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from habits.models import Tombstone
+from habits.sync import tombstone_retention
+
+
+class Command(BaseCommand):
+    help = 'Удаляет надгробия старше срока хранения (SYNC_TOMBSTONE_RETENTION_DAYS)'
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - tombstone_retention()
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено надгробий: {deleted}'))
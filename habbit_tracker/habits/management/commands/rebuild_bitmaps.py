@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from habits.models import Habit, HabitYearBitmap
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает годовые битовые карты отметок по истории'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--habit', type=int, nargs='*', dest='habit_ids',
+            help='ID привычек для пересборки (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('pk')
+        if options['habit_ids']:
+            habits = habits.filter(pk__in=options['habit_ids'])
+
+        count = 0
+        for habit in habits.iterator(chunk_size=500):
+            HabitYearBitmap.rebuild_for_habit(habit)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано привычек: {count}'))
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from habits.models import DailyStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные сводки пользователей по истории отметок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, nargs='*', dest='user_ids',
+            help='ID пользователей для пересчета (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        count = 0
+        for user in users.iterator(chunk_size=500):
+            DailyStats.rebuild_for_user(user)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано пользователей: {count}'))
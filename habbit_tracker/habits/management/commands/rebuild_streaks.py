@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from habits.models import Habit
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохраненные серии привычек по истории отметок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--habit', type=int, nargs='*', dest='habit_ids',
+            help='ID привычек для пересчета (по умолчанию все)'
+        )
+
+    def handle(self, *args, **options):
+        habits = Habit.objects.order_by('pk')
+        if options['habit_ids']:
+            habits = habits.filter(pk__in=options['habit_ids'])
+
+        count = 0
+        for habit in habits.iterator(chunk_size=500):
+            habit.rebuild_streak_state()
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано привычек: {count}'))
@@ -0,0 +1,166 @@
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from habits.models import Habit, ReminderDelivery, ReminderSettings
+from habits.response_cache import cache_settings
+from habits.tasks import send_daily_reminders
+import json
+import math
+import time
+
+# Эндпоинты: название -> URL от привычки пользователя
+ENDPOINTS = {
+    'index': lambda habit: reverse('index'),
+    'dashboard': lambda habit: reverse('dashboard'),
+    'statistics': lambda habit: reverse('statistics', args=[habit.pk]),
+    'calendar': lambda habit: reverse('calendar', args=[habit.pk]),
+    'public_achievements': lambda habit: reverse('public_achievements'),
+    'api_habits': lambda habit: reverse('habit-list'),
+    'api_statistics': lambda habit: reverse('habit-statistics', args=[habit.pk]),
+    'api_dashboard': lambda habit: reverse('api_dashboard'),
+}
+REMINDERS = 'send_daily_reminders'
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(timings, queries, errors=0):
+    return {
+        'calls': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+        'queries_per_call': round(sum(queries) / len(queries), 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа эндпоинтов и send_daily_reminders на данных seed_benchmark '
+        'и выводит p50/p95/p99 и число запросов в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Замеров на каждый эндпоинт')
+        parser.add_argument('--warmup', type=int, default=3, help='Вызовов до начала замеров')
+        parser.add_argument('--users', type=int, default=20, help='Пользователей, от имени которых идут запросы')
+        parser.add_argument('--prefix', default='bench', help='Префикс имен пользователей seed_benchmark')
+        parser.add_argument('--only', nargs='*', choices=[*ENDPOINTS, REMINDERS], help='Замерить только эти')
+        parser.add_argument('--cold', action='store_true', help='Очищать кэш ответов перед каждым запросом')
+        parser.add_argument('--output', help='Файл для JSON (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        bench_users = User.objects.filter(username__startswith=f'{options["prefix"]}_')
+        habits = {}
+        for habit in Habit.objects.filter(
+            user__in=bench_users, is_active=True
+        ).select_related('user').order_by('user_id', 'pk'):
+            habits.setdefault(habit.user_id, habit)
+        habits = list(habits.values())[:options['users']]
+        if not habits:
+            raise CommandError('Нет данных для замера, сначала выполните seed_benchmark')
+
+        names = options['only'] or [*ENDPOINTS, REMINDERS]
+        iterations = max(options['iterations'], 1)
+        results = {}
+
+        # Клиент Django обращается к хосту testserver; письма остаются в памяти, Telegram выключен
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            TELEGRAM_BOT_TOKEN='',
+        ):
+            clients = []
+            for habit in habits:
+                client = Client()
+                client.force_login(habit.user)
+                clients.append((client, habit))
+
+            for name in names:
+                if name == REMINDERS:
+                    results[name] = self.measure_reminders(bench_users, iterations, options['warmup'])
+                else:
+                    results[name] = self.measure_endpoint(
+                        ENDPOINTS[name], clients, iterations, options['warmup'], options['cold']
+                    )
+                self.stderr.write(f'{name}: p50 {results[name]["p50_ms"]} мс, p95 {results[name]["p95_ms"]} мс')
+
+        report = json.dumps({
+            'started_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': {
+                'users': bench_users.count(),
+                'habits': Habit.objects.filter(user__in=bench_users).count(),
+            },
+            'iterations': iterations,
+            'cold': options['cold'],
+            'results': results,
+        }, indent=2, ensure_ascii=False)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+
+    def measure_endpoint(self, url, clients, iterations, warmup, cold):
+        cache = caches[cache_settings()['alias']]
+        timings, queries, errors = [], [], 0
+
+        for call in range(warmup + iterations):
+            # Пользователи чередуются, чтобы не замерять один и тот же ответ
+            client, habit = clients[call % len(clients)]
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url(habit))
+                elapsed = time.perf_counter() - started
+            if call < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(len(context.captured_queries))
+            errors += response.status_code >= 400
+
+        return summarize(timings, queries, errors)
+
+    def measure_reminders(self, bench_users, iterations, warmup):
+        """
+        Каждый прогон начинается с того, что напоминания всех тестовых
+        пользователей уже пора отправить: худший случай пиковой минуты.
+        """
+        reminders = ReminderSettings.objects.filter(user__in=bench_users, enabled=True)
+        timings, queries, sent = [], [], []
+
+        for call in range(warmup + iterations):
+            now = timezone.now()
+            reminders.update(next_fire_at=now)
+            ReminderDelivery.objects.filter(user__in=bench_users).delete()
+            mail.outbox = []
+
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                # Напоминания настоящих пользователей не трогаем
+                count = send_daily_reminders(now=now, users=bench_users)
+                elapsed = time.perf_counter() - started
+            if call < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(len(context.captured_queries))
+            sent.append(count)
+
+        result = summarize(timings, queries)
+        result['sent_per_call'] = round(sum(sent) / len(sent), 1)
+        return result
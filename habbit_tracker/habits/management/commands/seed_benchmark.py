@@ -0,0 +1,185 @@
+from datetime import datetime, time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from habits.models import (
+    Achievement, AchievementThreshold, DailyStats, Habit, HabitLog, HabitYearBitmap,
+    PublicAchievementCounter, ReminderSettings
+)
+from habits.streaks import calculate_streak_state
+from itertools import islice
+import random
+import time as time_module
+
+TIMEZONES = ['Europe/Moscow', 'Europe/Kaliningrad', 'Asia/Yekaterinburg', 'Asia/Novosibirsk', 'UTC']
+HABIT_NAMES = ['Зарядка', 'Чтение', 'Медитация', 'Вода', 'Английский', 'Прогулка', 'Сон до 23:00', 'Без сахара']
+
+
+def generate_history(rng, start, end):
+    """
+    Отметки привычки с start по end: [(date, completed)].
+
+    У привычки своя базовая вероятность выполнения; выполнение вчера
+    ее повышает, пропуск понижает, поэтому получаются серии. В выходные
+    выполняют реже, часть дней остается без отметки.
+    """
+    base = rng.betavariate(4, 2)
+    skip_rate = rng.uniform(0.02, 0.2)
+    rows = []
+    completed = True
+    day = start
+    while day <= end:
+        if rng.random() >= skip_rate:
+            chance = base + (0.15 if completed else -0.15)
+            if day.weekday() >= 5:
+                chance -= 0.1
+            completed = rng.random() < min(max(chance, 0.05), 0.98)
+            rows.append((day, completed))
+        day += timedelta(days=1)
+    return rows
+
+
+def year_bitmaps(habit, rows):
+    years = {}
+    for date, completed in rows:
+        completed_bits, marked_bits = years.get(date.year, (0, 0))
+        bit = 1 << HabitYearBitmap.day_index(date)
+        years[date.year] = (completed_bits | (bit if completed else 0), marked_bits | bit)
+    return [
+        HabitYearBitmap(
+            habit=habit,
+            year=year,
+            completed=HabitYearBitmap.to_bytes(completed_bits),
+            marked=HabitYearBitmap.to_bytes(marked_bits)
+        )
+        for year, (completed_bits, marked_bits) in years.items()
+    ]
+
+
+def bulk_create_stream(model, objects, batch_size):
+    """bulk_create по пачкам из генератора, не держа все объекты в памяти"""
+    count = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return count
+        model.objects.bulk_create(batch, batch_size=batch_size)
+        count += len(batch)
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетических пользователей с привычками и многолетней историей отметок для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Число пользователей')
+        parser.add_argument('--habits', type=int, default=5, help='Привычек у каждого пользователя')
+        parser.add_argument('--years', type=float, default=2, help='Глубина истории отметок в годах')
+        parser.add_argument('--prefix', default='bench', help='Префикс имен пользователей')
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Объектов в одном INSERT')
+        parser.add_argument('--users-per-transaction', type=int, default=50, help='Пользователей в одной транзакции')
+        parser.add_argument('--clear', action='store_true', help='Удалить созданных ранее пользователей с префиксом')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        existing = User.objects.filter(username__startswith=f'{prefix}_')
+        if options['clear']:
+            deleted = existing.count()
+            existing.delete()
+            self.stdout.write(f'Удалено пользователей: {deleted}')
+        elif existing.exists():
+            raise CommandError(f'Пользователи с префиксом {prefix}_ уже есть, используйте --clear')
+
+        rng = random.Random(options['seed'])
+        # Хеш пароля считается один раз: для каждого пользователя это заняло бы минуты
+        password = make_password(prefix)
+        thresholds = AchievementThreshold.get_map()
+        totals = {'users': 0, 'habits': 0, 'logs': 0, 'achievements': 0}
+        started = time_module.perf_counter()
+
+        step = max(options['users_per_transaction'], 1)
+        for offset in range(0, options['users'], step):
+            count = min(step, options['users'] - offset)
+            with transaction.atomic():
+                self.seed_users(rng, prefix, password, range(offset, offset + count), thresholds, options, totals)
+            self.stdout.write(f'Пользователей: {totals["users"]}, отметок: {totals["logs"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {totals["users"]}, привычек: {totals["habits"]}, '
+            f'отметок: {totals["logs"]}, достижений: {totals["achievements"]} '
+            f'({time_module.perf_counter() - started:.1f} с)'
+        ))
+
+    def seed_users(self, rng, prefix, password, numbers, thresholds, options, totals):
+        today = timezone.now().date()
+        history_days = max(int(options['years'] * 365), 1)
+        batch_size = options['batch_size']
+
+        # bulk_create не вызывает сигналы, поэтому настройки напоминаний создаются здесь же
+        users = User.objects.bulk_create(
+            User(username=f'{prefix}_{number}', email=f'{prefix}_{number}@example.com', password=password)
+            for number in numbers
+        )
+        reminders = []
+        for user in users:
+            reminder = ReminderSettings(
+                user=user,
+                enabled=rng.random() < 0.8,
+                reminder_time=time(rng.randint(6, 22), rng.choice([0, 15, 30, 45])),
+                timezone=rng.choice(TIMEZONES),
+            )
+            reminder.next_fire_at = reminder.compute_next_fire_at()
+            reminders.append(reminder)
+        ReminderSettings.objects.bulk_create(reminders)
+
+        habits = Habit.objects.bulk_create(
+            Habit(
+                user=user,
+                name=rng.choice(HABIT_NAMES),
+                target=rng.choice([21, 30, 66]),
+                is_active=rng.random() < 0.9,
+            )
+            for user in users
+            for _ in range(options['habits'])
+        )
+
+        histories = {}
+        for habit in habits:
+            start = today - timedelta(days=rng.randint(min(30, history_days), history_days))
+            # Неактивные привычки забросили где-то в середине истории
+            end = today if habit.is_active else start + (today - start) * rng.random()
+            histories[habit.pk] = generate_history(rng, start, end)
+            habit.created_at = timezone.make_aware(datetime.combine(start, time(12, 0)))
+            for field, value in calculate_streak_state(histories[habit.pk]).items():
+                setattr(habit, field, value)
+        Habit.objects.bulk_update(habits, ['created_at'] + Habit.STREAK_FIELDS, batch_size=1000)
+
+        logs = (
+            HabitLog(habit=habit, date=date, completed=completed)
+            for habit in habits
+            for date, completed in histories[habit.pk]
+        )
+        totals['logs'] += bulk_create_stream(HabitLog, logs, batch_size)
+        HabitYearBitmap.objects.bulk_create(
+            [bitmap for habit in habits for bitmap in year_bitmaps(habit, histories[habit.pk])],
+            batch_size=1000
+        )
+
+        for user in users:
+            DailyStats.rebuild_for_user(user)
+
+        achievements = []
+        for habit in habits:
+            for length, title in thresholds.items():
+                if length <= habit.best_streak:
+                    achievement = Achievement.for_streak(habit, length, title)
+                    achievement.is_public = rng.random() < 0.7
+                    achievements.append(achievement)
+        Achievement.objects.bulk_create(achievements, batch_size=1000)
+        PublicAchievementCounter.refresh_users([user.pk for user in users])
+
+        totals['users'] += len(users)
+        totals['habits'] += len(habits)
+        totals['achievements'] += len(achievements)
@@ -0,0 +1,278 @@
+"""
+Метрики в текстовом формате Prometheus без внешних сервисов.
+
+Каждый процесс (воркер gunicorn, планировщик) копит метрики в памяти
+и не чаще раза в METRICS_FLUSH_INTERVAL секунд сбрасывает их в свой
+JSON-файл в METRICS_DIR. Эндпоинт /metrics читает файлы всех процессов
+и суммирует: счетчики и гистограммы складываются, у датчиков берется
+максимум по живым процессам. Файлы завершившихся процессов остаются, чтобы
+счетчики не убывали; их датчики не учитываются, иначе, например, опоздание
+очереди навсегда осталось бы худшим из когда-либо записанных. Каталог стоит
+очищать при деплое.
+"""
+from django.conf import settings
+from uuid import uuid4
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+RUN_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Название -> (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'habits_http_request_duration_seconds': (
+        'histogram', 'Время ответа по маршруту, методу и статусу', LATENCY_BUCKETS
+    ),
+    'habits_http_db_queries_total': ('counter', 'Запросы к БД при обработке HTTP-запросов', None),
+    'habits_http_db_duration_seconds_total': ('counter', 'Время запросов к БД при обработке HTTP-запросов', None),
+    'habits_response_cache_events_total': ('counter', 'События кэша ответов API: hit, miss, store, too_large', None),
+    'habits_response_cache_hit_ratio': ('gauge', 'Доля попаданий в кэш ответов API', None),
+    'habits_reminder_run_duration_seconds': ('histogram', 'Длительность send_daily_reminders', RUN_BUCKETS),
+    'habits_reminder_users_scanned_total': ('counter', 'Настройки напоминаний, выбранные к отправке', None),
+    'habits_reminder_sent_total': ('counter', 'Отправленные напоминания', None),
+    'habits_reminder_failed_total': ('counter', 'Напоминания, которые не удалось отправить', None),
+    'habits_reminder_queue_lag_seconds': (
+        'gauge', 'Опоздание самого старого напоминания в последнем запуске', None
+    ),
+    'habits_reminder_last_run_timestamp_seconds': ('gauge', 'Время последнего запуска рассылки', None),
+    'habits_reminder_run_errors_total': ('counter', 'Запуски рассылки, завершившиеся ошибкой', None),
+}
+
+
+def metrics_settings():
+    return {
+        'enabled': getattr(settings, 'METRICS_ENABLED', True),
+        'dir': getattr(settings, 'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'habits-metrics')),
+        'flush_interval': getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0),
+        'token': getattr(settings, 'METRICS_TOKEN', ''),
+    }
+
+
+def label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class MetricsRegistry:
+    """Метрики текущего процесса"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.pid = os.getpid()
+            # Свой файл у каждого запуска процесса: PID может повториться
+            self.filename = f'{self.pid}-{uuid4().hex[:8]}.json'
+            self.counters = {}
+            self.histograms = {}
+            self.gauges = {}
+            self.flushed_at = 0.0
+
+    def check_fork(self):
+        # После fork дочерний процесс не должен продолжать счетчики родителя
+        if os.getpid() != self.pid:
+            self.reset()
+
+    def inc(self, name, labels=None, value=1):
+        self.check_fork()
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        self.check_fork()
+        buckets = METRICS[name][2]
+        key = (name, label_key(labels))
+        with self.lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def set(self, name, value, labels=None):
+        self.check_fork()
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, dict(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, dict(labels), list(state['buckets']), state['sum'], state['count']]
+                    for (name, labels), state in self.histograms.items()
+                ],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self.gauges.items()],
+            }
+
+    def flush(self, force=False):
+        """Записывает метрики процесса в его файл, не чаще flush_interval"""
+        options = metrics_settings()
+        now = time.monotonic()
+        if not force and now - self.flushed_at < options['flush_interval']:
+            return
+        self.flushed_at = now
+
+        try:
+            os.makedirs(options['dir'], exist_ok=True)
+            path = os.path.join(options['dir'], self.filename)
+            # Запись во временный файл и переименование: читатель не увидит файл наполовину
+            fd, tmp_path = tempfile.mkstemp(dir=options['dir'], suffix='.tmp')
+            with os.fdopen(fd, 'w') as tmp:
+                json.dump(self.snapshot(), tmp)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning('Не удалось записать метрики в %s', options['dir'], exc_info=True)
+
+
+registry = MetricsRegistry()
+
+
+def process_alive(filename):
+    """Жив ли процесс, записавший файл {pid}-{uuid}.json"""
+    try:
+        pid = int(filename.split('-', 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+def collect(directory=None):
+    """Сумма метрик всех процессов из каталога METRICS_DIR"""
+    directory = directory or metrics_settings()['dir']
+    counters, histograms, gauges = {}, {}, {}
+
+    try:
+        filenames = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except FileNotFoundError:
+        filenames = []
+
+    for filename in filenames:
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        for name, labels, value in data['counters']:
+            key = (name, label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in data['histograms']:
+            key = (name, label_key(labels))
+            state = histograms.setdefault(key, {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+            state['buckets'] = [a + b for a, b in zip(state['buckets'], buckets)]
+            state['sum'] += total
+            state['count'] += count
+        if not process_alive(filename):
+            continue
+        for name, labels, value in data['gauges']:
+            key = (name, label_key(labels))
+            gauges[key] = max(gauges.get(key, -math.inf), value)
+
+    # Доля попаданий считается по уже сложенным счетчикам
+    cache_events = {}
+    for (name, labels), value in counters.items():
+        if name == 'habits_response_cache_events_total':
+            labels = dict(labels)
+            cache_events.setdefault(labels['endpoint'], {})[labels['event']] = value
+    for endpoint, events in cache_events.items():
+        lookups = events.get('hit', 0) + events.get('miss', 0)
+        if lookups:
+            gauges[('habits_response_cache_hit_ratio', (('endpoint', endpoint),))] = events.get('hit', 0) / lookups
+
+    return counters, histograms, gauges
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms, gauges):
+    """Текстовый формат Prometheus 0.0.4"""
+    samples = {}
+    for (name, labels), value in counters.items():
+        samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {format_value(value)}')
+    for (name, labels), value in gauges.items():
+        samples.setdefault(name, []).append(f'{name}{format_labels(labels)} {format_value(value)}')
+    for (name, labels), state in histograms.items():
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(METRICS[name][2], state['buckets']):
+            cumulative += count
+            lines.append(f'{name}_bucket{format_labels(labels, [("le", format_value(float(bound)))])} {cumulative}')
+        lines.append(f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} {state["count"]}')
+        lines.append(f'{name}_sum{format_labels(labels)} {format_value(state["sum"])}')
+        lines.append(f'{name}_count{format_labels(labels)} {state["count"]}')
+
+    output = []
+    for name, (kind, description, _) in METRICS.items():
+        if name in samples:
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {kind}')
+            output.extend(sorted(samples[name]))
+    return '\n'.join(output) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Гистограмма времени ответа по маршруту, методу и статусу и число
+    запросов к БД. Стоит в MIDDLEWARE перед ProfilingMiddleware
+    и берет из ее профиля данные о запросах к БД.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_settings()['enabled']:
+            return self.get_response(request)
+
+        from .profiling import view_name
+
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # Имя маршрута, а не путь: число рядов не растет с числом объектов
+        route = view_name(request) or 'unmatched'
+        registry.observe(
+            'habits_http_request_duration_seconds', elapsed,
+            {'route': route, 'method': request.method, 'status': str(response.status_code)}
+        )
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            registry.inc('habits_http_db_queries_total', {'route': route}, profile.count)
+            registry.inc('habits_http_db_duration_seconds_total', {'route': route}, profile.duration)
+        registry.flush()
+        return response
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from .metrics import collect, metrics_settings, registry, render
+
+
+def metrics_view(request):
+    """
+    Метрики всех процессов для Prometheus.
+
+    С METRICS_TOKEN доступ по заголовку Authorization: Bearer <токен>,
+    без него - только персоналу и при DEBUG.
+    """
+    token = metrics_settings()['token']
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG or (request.user.is_authenticated and request.user.is_staff)
+    if not allowed:
+        return HttpResponseForbidden()
+
+    # Свои метрики записываем сразу, чтобы ответ не отставал на интервал сброса
+    registry.flush(force=True)
+    return HttpResponse(render(*collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+from habits.streaks import calculate_streak_state
+
+
+def fill_streak_state(apps, schema_editor):
+    Habit = apps.get_model('habits', 'Habit')
+    HabitLog = apps.get_model('habits', 'HabitLog')
+    for habit in Habit.objects.iterator():
+        rows = HabitLog.objects.filter(habit=habit).order_by('date').values_list('date', 'completed')
+        for field, value in calculate_streak_state(rows).items():
+            setattr(habit, field, value)
+        habit.save(update_fields=['current_streak', 'best_streak', 'last_completed_date', 'last_missed_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0003_achievement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='best_streak',
+            field=models.PositiveIntegerField(default=0, verbose_name='Лучшая серия'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='current_streak',
+            field=models.PositiveIntegerField(default=0, verbose_name='Текущая серия'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='last_completed_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Последнее выполнение'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='last_missed_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Последний пропуск'),
+        ),
+        migrations.RunPython(fill_streak_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_bitmaps(apps, schema_editor):
+    Habit = apps.get_model('habits', 'Habit')
+    HabitLog = apps.get_model('habits', 'HabitLog')
+    HabitYearBitmap = apps.get_model('habits', 'HabitYearBitmap')
+    for habit in Habit.objects.iterator():
+        years = {}
+        for date, completed in HabitLog.objects.filter(habit=habit).values_list('date', 'completed'):
+            completed_bits, marked_bits = years.get(date.year, (0, 0))
+            bit = 1 << (date.timetuple().tm_yday - 1)
+            years[date.year] = (completed_bits | (bit if completed else 0), marked_bits | bit)
+        HabitYearBitmap.objects.bulk_create([
+            HabitYearBitmap(
+                habit=habit,
+                year=year,
+                completed=completed_bits.to_bytes(46, 'little'),
+                marked=marked_bits.to_bytes(46, 'little'),
+            )
+            for year, (completed_bits, marked_bits) in years.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0004_habit_streak_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitYearBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('completed', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', max_length=46)),
+                ('marked', models.BinaryField(default=b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00', max_length=46)),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_bitmaps', to='habits.habit')),
+            ],
+            options={
+                'unique_together': {('habit', 'year')},
+            },
+        ),
+        migrations.RunPython(fill_bitmaps, migrations.RunPython.noop),
+    ]
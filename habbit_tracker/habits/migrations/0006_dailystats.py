@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:10
+
+from bisect import bisect_right
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_daily_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Habit = apps.get_model('habits', 'Habit')
+    HabitLog = apps.get_model('habits', 'HabitLog')
+    DailyStats = apps.get_model('habits', 'DailyStats')
+    for user in User.objects.iterator():
+        created_dates = sorted(
+            created_at.date() for created_at in
+            Habit.objects.filter(user=user, is_active=True).values_list('created_at', flat=True)
+        )
+        rows = HabitLog.objects.filter(habit__user=user).order_by().values('date').annotate(
+            completed=Count('id', filter=Q(completed=True))
+        ).values_list('date', 'completed')
+        DailyStats.objects.bulk_create([
+            DailyStats(
+                user=user,
+                date=date,
+                completed_habits=completed,
+                active_habits=bisect_right(created_dates, date),
+            )
+            for date, completed in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0005_habityearbitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed_habits', models.PositiveIntegerField(default=0, verbose_name='Выполнено привычек')),
+                ('active_habits', models.PositiveIntegerField(default=0, verbose_name='Активных привычек')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0006_dailystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['date', 'id'], name='habitlog_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='habitlog',
+            index=models.Index(fields=['habit', 'completed', 'date'], name='habitlog_habit_completed_date'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0008_sync_timestamps'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='remindersettings',
+            index=models.Index(condition=models.Q(('email_notifications', True), ('enabled', True)), fields=['reminder_time'], name='reminder_due_time'),
+        ),
+    ]
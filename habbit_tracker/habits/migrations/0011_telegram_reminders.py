@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0010_reminder_sharding'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='remindersettings',
+            name='reminder_due_time',
+        ),
+        migrations.AlterField(
+            model_name='reminderdelivery',
+            name='channel',
+            field=models.CharField(choices=[('email', 'Email'), ('telegram', 'Telegram')], default='email', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='remindersettings',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['reminder_time'], name='reminder_due_time'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:31
+
+import habits.reminders
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_next_fire_at(apps, schema_editor):
+    """Время ближайшего напоминания для уже существующих настроек"""
+    ReminderSettings = apps.get_model('habits', 'ReminderSettings')
+    now = timezone.now()
+
+    reminders = list(ReminderSettings.objects.filter(enabled=True))
+    for reminder in reminders:
+        reminder.next_fire_at = habits.reminders.next_fire_time(reminder.reminder_time, reminder.timezone, now)
+    ReminderSettings.objects.bulk_update(reminders, ['next_fire_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0011_telegram_reminders'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='remindersettings',
+            name='reminder_due_time',
+        ),
+        migrations.RemoveField(
+            model_name='schedulerlease',
+            name='processed_until',
+        ),
+        migrations.AddField(
+            model_name='remindersettings',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='remindersettings',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=64, validators=[habits.reminders.validate_timezone], verbose_name='Часовой пояс'),
+        ),
+        migrations.AddIndex(
+            model_name='remindersettings',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['next_fire_at'], name='reminder_next_fire_at'),
+        ),
+        migrations.RunPython(fill_next_fire_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+# Пороги, которые раньше были зашиты в Achievement.check_and_create_achievements
+THRESHOLDS = {
+    7: "Первая неделя!",
+    14: "Две недели подряд!",
+    21: "Три недели! Формируется привычка!",
+    30: "Месяц! Вы круты!",
+    60: "Два месяца! Невероятно!",
+    90: "Три месяца! Привычка сформирована!",
+}
+
+
+def fill_thresholds(apps, schema_editor):
+    AchievementThreshold = apps.get_model('habits', 'AchievementThreshold')
+    AchievementThreshold.objects.bulk_create(
+        [AchievementThreshold(streak_length=length, title=title) for length, title in THRESHOLDS.items()],
+        ignore_conflicts=True,
+    )
+
+
+def remove_duplicate_achievements(apps, schema_editor):
+    """Оставляем по одному достижению на привычку и длину серии, самое раннее"""
+    Achievement = apps.get_model('habits', 'Achievement')
+    keep = Achievement.objects.values('habit_id', 'streak_length').annotate(first_id=Min('id'))
+    duplicates = Achievement.objects.exclude(id__in=[row['first_id'] for row in keep])
+    duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0012_reminder_timezone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AchievementThreshold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('streak_length', models.PositiveIntegerField(unique=True, verbose_name='Длина серии')),
+                ('title', models.CharField(max_length=200, verbose_name='Название достижения')),
+            ],
+            options={
+                'ordering': ['streak_length'],
+            },
+        ),
+        migrations.RunPython(fill_thresholds, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_achievements, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='achievement',
+            constraint=models.UniqueConstraint(fields=('habit', 'streak_length'), name='achievement_unique_habit_streak'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Achievement = apps.get_model('habits', 'Achievement')
+    PublicAchievementCounter = apps.get_model('habits', 'PublicAchievementCounter')
+
+    rows = Achievement.objects.filter(is_public=True).order_by().values('user_id').annotate(
+        count=Count('id')
+    ).values_list('user_id', 'count')
+    PublicAchievementCounter.objects.bulk_create(
+        [PublicAchievementCounter(user_id=user_id, count=count) for user_id, count in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0013_achievement_thresholds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicAchievementCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Публичных достижений')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['-achieved_at'], name='achievement_public_recent'),
+        ),
+        migrations.AddField(
+            model_name='publicachievementcounter',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='public_achievement_counter', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='publicachievementcounter',
+            index=models.Index(fields=['-count', 'user'], name='public_counter_top'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
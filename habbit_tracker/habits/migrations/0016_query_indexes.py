@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 03:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0015_user_data_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Новое ограничение создается до удаления старого, чтобы уникальность не пропадала
+        migrations.AddConstraint(
+            model_name='habitlog',
+            constraint=models.UniqueConstraint(fields=('habit', 'date'), name='habitlog_unique_habit_date'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='habitlog',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='achievement',
+            index=models.Index(fields=['user', '-streak_length'], name='achievement_user_streak'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(fields=['user', '-created_at'], name='habit_user_created_at'),
+        ),
+        migrations.AddIndex(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='habit_user_active'),
+        ),
+    ]
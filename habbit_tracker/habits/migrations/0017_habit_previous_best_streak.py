@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+from habits.streaks import calculate_streak_state
+
+
+def fill_previous_best_streak(apps, schema_editor):
+    Habit = apps.get_model('habits', 'Habit')
+    HabitLog = apps.get_model('habits', 'HabitLog')
+    for habit in Habit.objects.filter(logs__completed=False).distinct().iterator():
+        rows = HabitLog.objects.filter(habit=habit).order_by('date').values_list('date', 'completed')
+        habit.previous_best_streak = calculate_streak_state(rows)['previous_best_streak']
+        habit.save(update_fields=['previous_best_streak'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0016_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='previous_best_streak',
+            field=models.PositiveIntegerField(default=0, verbose_name='Лучшая завершенная серия'),
+        ),
+        migrations.RunPython(fill_previous_best_streak, migrations.RunPython.noop),
+    ]
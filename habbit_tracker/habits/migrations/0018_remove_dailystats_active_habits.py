@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0017_habit_previous_best_streak'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dailystats',
+            name='active_habits',
+        ),
+    ]
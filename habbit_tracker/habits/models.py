@@ -1,6 +1,29 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .reminders import DEFAULT_TIMEZONE, next_fire_time, validate_timezone
+from .streaks import calculate_streak_state
+from functools import partial
+import threading
+
+
+class HabitQuerySet(models.QuerySet):
+    def with_log_stats(self, today=None):
+        """Аннотирует счетчики отметок одним запросом вместо запросов на каждую привычку"""
+        from datetime import timedelta
+
+        end_date = today or timezone.now().date()
+        start_date = end_date - timedelta(days=30)
+
+        return self.annotate(
+            total_logs=Count('logs'),
+            total_completed=Count('logs', filter=Q(logs__completed=True)),
+            recent_completed=Count('logs', filter=Q(
+                logs__completed=True,
+                logs__date__range=[start_date, end_date],
+            )),
+        )
 
 
 class Habit(models.Model):
@@ -27,10 +50,36 @@ class Habit(models.Model):
         verbose_name='Цель (дней подряд)'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, verbose_name='Активна')
 
+    # Серии хранятся в привычке и обновляются при изменении отметок
+    current_streak = models.PositiveIntegerField(default=0, verbose_name='Текущая серия')
+    best_streak = models.PositiveIntegerField(default=0, verbose_name='Лучшая серия')
+    last_completed_date = models.DateField(null=True, blank=True, verbose_name='Последнее выполнение')
+    last_missed_date = models.DateField(null=True, blank=True, verbose_name='Последний пропуск')
+    # Лучшая серия без текущей: снятие отметки восстанавливает best_streak без пересчета
+    previous_best_streak = models.PositiveIntegerField(default=0, verbose_name='Лучшая завершенная серия')
+
+    STREAK_FIELDS = [
+        'current_streak', 'best_streak', 'previous_best_streak', 'last_completed_date', 'last_missed_date'
+    ]
+
+    objects = HabitQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='habit_user_updated_at'),
+            # Список привычек в API
+            models.Index(fields=['user', '-created_at'], name='habit_user_created_at'),
+            # Активные привычки пользователя: дашборд, статистика, напоминания
+            models.Index(fields=['user'], condition=Q(is_active=True), name='habit_user_active'),
+        ]
+
     def completed_logs_count(self):
         """Количество выполненных отметок"""
+        if hasattr(self, 'total_completed'):
+            return self.total_completed
         return self.logs.filter(completed=True).count()
 
     def __str__(self):
@@ -38,19 +87,107 @@ class Habit(models.Model):
 
     def get_current_streak(self):
         """Текущая серия выполненных дней подряд"""
-        from django.db.models import Max
+        return self.current_streak
 
-        # Находим последний пропущенный день
-        last_missed = self.logs.filter(completed=False).aggregate(Max('date'))['date__max']
+    def rebuild_streak_state(self):
+        """Полный пересчет серий по всей истории отметок"""
+        rows = self.logs.order_by('date').values_list('date', 'completed')
+        for field, value in calculate_streak_state(rows.iterator()).items():
+            setattr(self, field, value)
+        self.save(update_fields=self.STREAK_FIELDS + ['updated_at'])
+
+    def update_streak_state(self, date, was_completed, is_completed):
+        """
+        Обновляет серии после изменения отметки за date.
+
+        was_completed/is_completed - статус до и после изменения,
+        None означает, что отметки нет. Отметки после последнего пропуска
+        и сам последний пропуск обрабатываются без чтения всей истории,
+        правка более старых дней приводит к полному пересчету.
+        """
+        if was_completed == is_completed:
+            return
+
+        with transaction.atomic(savepoint=False):
+            # Перечитываем серии под блокировкой, экземпляр может быть устаревшим
+            locked = Habit.objects.select_for_update().only(*self.STREAK_FIELDS).get(pk=self.pk)
+            for field in self.STREAK_FIELDS:
+                setattr(self, field, getattr(locked, field))
+
+            if self._apply_streak_change(date, was_completed, is_completed):
+                self.save(update_fields=self.STREAK_FIELDS + ['updated_at'])
+            else:
+                self.rebuild_streak_state()
+
+    def _apply_streak_change(self, date, was_completed, is_completed):
+        """Инкрементальное обновление серий, False - нужен полный пересчет"""
+        last_missed = self.last_missed_date
+        last_completed = self.last_completed_date
+        after_last_miss = last_missed is None or date > last_missed
+
+        if after_last_miss and was_completed is None and is_completed:
+            # Новая выполненная отметка продолжает текущую серию
+            self.current_streak += 1
+            if last_completed is None or date > last_completed:
+                self.last_completed_date = date
+
+        elif after_last_miss and is_completed is False:
+            # Новый пропуск делит текущую серию: выполнения до него образуют завершенную
+            if was_completed:
+                self.current_streak -= 1
+            self._split_current_streak(date)
+            if date == last_completed:
+                self.last_completed_date = self._last_completed_before(date)
+
+        elif after_last_miss and was_completed and is_completed is None:
+            # Удалено выполнение из текущей серии
+            self.current_streak -= 1
+            if date == last_completed:
+                self.last_completed_date = self._last_completed_before(date)
+
+        elif date == last_missed and was_completed is False:
+            # Последний пропуск снят: серия до него сливается с текущей
+            previous_missed = self.logs.filter(
+                completed=False, date__lt=date
+            ).aggregate(Max('date'))['date__max']
+            before = self.logs.filter(completed=True, date__lt=date)
+            if previous_missed:
+                before = before.filter(date__gt=previous_missed)
+            before = before.count()
+
+            if before and before == self.previous_best_streak:
+                # Лучшей завершенной могла быть именно слитая серия,
+                # ищем лучшую среди серий до предыдущего пропуска
+                self.previous_best_streak = self._best_streak_until(previous_missed)
+            self.current_streak += before + (1 if is_completed else 0)
+            self.last_missed_date = previous_missed
+            if is_completed and (last_completed is None or date > last_completed):
+                self.last_completed_date = date
 
-        if last_missed:
-            # Если был пропуск, считаем от него
-            streak_logs = self.logs.filter(date__gt=last_missed, completed=True).order_by('date')
         else:
-            # Если пропусков не было, считаем все выполненные подряд
-            streak_logs = self.logs.filter(completed=True).order_by('date')
+            return False
+
+        self.best_streak = max(self.previous_best_streak, self.current_streak)
+        return True
 
-        return streak_logs.count()
+    def _split_current_streak(self, date):
+        """Пропуск за date внутри текущей серии становится последним пропуском"""
+        after = 0
+        if self.last_completed_date is not None and date < self.last_completed_date:
+            after = self.logs.filter(completed=True, date__gt=date).count()
+        self.previous_best_streak = max(self.previous_best_streak, self.current_streak - after)
+        self.current_streak = after
+        self.last_missed_date = date
+
+    def _last_completed_before(self, date):
+        return self.logs.filter(completed=True, date__lt=date).aggregate(Max('date'))['date__max']
+
+    def _best_streak_until(self, date):
+        """Лучшая серия по отметкам не позже date"""
+        if date is None:
+            return 0
+        rows = self.logs.filter(date__lte=date).order_by('date').values_list('date', 'completed')
+        return calculate_streak_state(rows.iterator())['best_streak']
 
     def get_completion_percentage(self):
         """Процент выполнения за последние 30 дней"""
@@ -62,10 +199,14 @@ class Habit(models.Model):
             start_date = end_date - timedelta(days=30)
 
             total_days = 30  # Упрощаем: всегда 30 дней
-            completed_days = self.logs.filter(
-                date__range=[start_date, end_date],
-                completed=True
-            ).count()
+            if hasattr(self, 'recent_completed'):
+                # Значение уже посчитано в HabitQuerySet.with_log_stats()
+                completed_days = self.recent_completed
+            else:
+                completed_days = self.logs.filter(
+                    date__range=[start_date, end_date],
+                    completed=True
+                ).count()
 
             percentage = (completed_days / total_days) * 100 if total_days > 0 else 0
             return round(percentage)
@@ -79,23 +220,246 @@ class HabitLog(models.Model):
     date = models.DateField(default=timezone.now)
     completed = models.BooleanField(default=False)
     notes = models.TextField(blank=True, verbose_name='Заметки')
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ['habit', 'date']  # Одна запись на день
         ordering = ['-date']
+        constraints = [
+            # Одна запись на день; индекс ограничения обслуживает выборки отметок привычки по дате
+            models.UniqueConstraint(fields=['habit', 'date'], name='habitlog_unique_habit_date'),
+        ]
+        indexes = [
+            models.Index(fields=['habit', 'updated_at'], name='habitlog_habit_updated_at'),
+            # Курсорная пагинация и фильтры по дате для логов пользователя
+            models.Index(fields=['date', 'id'], name='habitlog_date_id'),
+            models.Index(fields=['habit', 'completed', 'date'], name='habitlog_habit_completed_date'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженное состояние, чтобы обновлять серии по разнице
+        instance._loaded_state = (instance.__dict__.get('date'), instance.__dict__.get('completed'))
+        return instance
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        self.date = self._meta.get_field('date').to_python(self.date)
+        adding = self._state.adding
+        previous = getattr(self, '_loaded_state', None)
+
+        # Без точек сохранения: ошибка любого шага откатывает сохранение целиком
+        with transaction.atomic(savepoint=False):
+            # Привычку загружаем до сохранения, чтобы сигналы post_save не читали ее заново
+            habit = self.habit
+            super().save(*args, **kwargs)
+
+            if adding:
+                habit.update_streak_state(self.date, None, self.completed)
+            elif previous is None or None in previous or previous[0] != self.date:
+                # Исходное состояние неизвестно или отметку перенесли на другой день
+                habit.rebuild_streak_state()
+            else:
+                habit.update_streak_state(self.date, previous[1], self.completed)
+
+            if previous is not None and previous[0] not in (None, self.date):
+                HabitYearBitmap.set_day(self.habit_id, previous[0], None)
+            # Правка одних заметок не меняет битовые карты
+            if previous != (self.date, self.completed):
+                HabitYearBitmap.set_day(self.habit_id, self.date, self.completed)
+
+            if adding or (previous is not None and None not in previous):
+                user_id = habit.user_id
+                if not adding and previous[1]:
+                    DailyStats.add_completed(user_id, previous[0], -1)
+                if self.completed:
+                    DailyStats.add_completed(user_id, self.date, 1)
+            else:
+                # Исходное состояние неизвестно: пересчитываем сводку за день по отметкам
+                DailyStats.refresh_days(habit.user, [self.date])
+
+        self._loaded_state = (self.date, self.completed)
 
-        # Если отметка о выполнении, проверяем достижения
+        # Если отметка о выполнении, проверяем достижения после коммита
         if self.completed:
-            from .models import Achievement
-            Achievement.check_and_create_achievements(self.habit)
+            from .achievements import schedule_achievement_check
+            schedule_achievement_check(self.habit_id)
 
     def __str__(self):
         status = "✓" if self.completed else "✗"
         return f"{self.habit.name} - {self.date}: {status}"
 
+
+class HabitYearBitmap(models.Model):
+    """
+    Отметки привычки за год в виде битовых карт: бит i - день года i + 1.
+
+    marked - есть ли отметка за день, completed - выполнена ли она.
+    Синхронизируется с HabitLog при сохранении и удалении отметок.
+    """
+    SIZE = 46  # 366 бит
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name='year_bitmaps')
+    year = models.PositiveSmallIntegerField()
+    completed = models.BinaryField(max_length=SIZE, default=bytes(SIZE))
+    marked = models.BinaryField(max_length=SIZE, default=bytes(SIZE))
+
+    class Meta:
+        unique_together = ['habit', 'year']
+
+    def __str__(self):
+        return f"{self.habit_id} - {self.year}"
+
+    @staticmethod
+    def day_index(date):
+        return date.timetuple().tm_yday - 1
+
+    @staticmethod
+    def to_int(value):
+        return int.from_bytes(bytes(value), 'little')
+
+    @classmethod
+    def to_bytes(cls, value):
+        return value.to_bytes(cls.SIZE, 'little')
+
+    @classmethod
+    def set_day(cls, habit_id, date, completed):
+        """Записывает статус дня, completed=None снимает отметку"""
+        with transaction.atomic(savepoint=False):
+            bitmap, _ = cls.objects.select_for_update().get_or_create(habit_id=habit_id, year=date.year)
+            bit = 1 << cls.day_index(date)
+            completed_bits = cls.to_int(bitmap.completed) & ~bit
+            marked_bits = cls.to_int(bitmap.marked) & ~bit
+            if completed is not None:
+                marked_bits |= bit
+                if completed:
+                    completed_bits |= bit
+
+            bitmap.completed = cls.to_bytes(completed_bits)
+            bitmap.marked = cls.to_bytes(marked_bits)
+            bitmap.save(update_fields=['completed', 'marked'])
+
+    @classmethod
+    def set_days(cls, days):
+        """Записывает статусы дней пачкой: {(habit_id, date): completed}"""
+        if not days:
+            return
+
+        habit_ids = {habit_id for habit_id, _ in days}
+        years = {date.year for _, date in days}
+        bitmaps = {
+            (bitmap.habit_id, bitmap.year): bitmap
+            for bitmap in cls.objects.select_for_update().filter(habit_id__in=habit_ids, year__in=years)
+        }
+
+        for (habit_id, date), completed in days.items():
+            bitmap = bitmaps.get((habit_id, date.year))
+            if bitmap is None:
+                bitmap = bitmaps[(habit_id, date.year)] = cls(habit_id=habit_id, year=date.year)
+            bit = 1 << cls.day_index(date)
+            completed_bits = cls.to_int(bitmap.completed) & ~bit
+            marked_bits = cls.to_int(bitmap.marked) | bit
+            if completed:
+                completed_bits |= bit
+            bitmap.completed = cls.to_bytes(completed_bits)
+            bitmap.marked = cls.to_bytes(marked_bits)
+
+        cls.objects.bulk_create(
+            bitmaps.values(),
+            update_conflicts=True,
+            unique_fields=['habit', 'year'],
+            update_fields=['completed', 'marked'],
+        )
+
+    @classmethod
+    def rebuild_for_habit(cls, habit):
+        """Пересобирает битовые карты привычки по истории отметок"""
+        years = {}
+        for date, completed in habit.logs.values_list('date', 'completed').iterator():
+            completed_bits, marked_bits = years.get(date.year, (0, 0))
+            bit = 1 << cls.day_index(date)
+            years[date.year] = (completed_bits | (bit if completed else 0), marked_bits | bit)
+
+        with transaction.atomic():
+            cls.objects.filter(habit=habit).delete()
+            cls.objects.bulk_create([
+                cls(habit=habit, year=year, completed=cls.to_bytes(completed_bits), marked=cls.to_bytes(marked_bits))
+                for year, (completed_bits, marked_bits) in years.items()
+            ])
+
+
+class DailyStats(models.Model):
+    """
+    Дневная сводка пользователя: сколько привычек выполнено за день.
+
+    completed_habits обновляется при изменении отметок.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    completed_habits = models.PositiveIntegerField(default=0, verbose_name='Выполнено привычек')
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date}: {self.completed_habits}"
+
+    @classmethod
+    def add_completed(cls, user_id, date, delta):
+        """Изменяет число выполненных привычек за день на delta"""
+        updated = cls.objects.filter(user_id=user_id, date=date).update(
+            completed_habits=F('completed_habits') + delta
+        )
+        if not updated:
+            # Записи за день нет: создаем пустую, параллельная вставка той же записи игнорируется,
+            # и повторяем изменение; счетчик не опускается ниже нуля
+            cls.objects.bulk_create([cls(user_id=user_id, date=date)], ignore_conflicts=True)
+            cls.objects.filter(user_id=user_id, date=date, completed_habits__gte=-delta).update(
+                completed_habits=F('completed_habits') + delta
+            )
+
+    @classmethod
+    def refresh_days(cls, user, dates):
+        """Пересчитывает сводки пользователя за указанные дни одним запросом"""
+        if not dates:
+            return
+
+        completed_by_date = dict(
+            HabitLog.objects.filter(habit__user=user, date__in=dates, completed=True).order_by().values(
+                'date'
+            ).annotate(count=Count('id')).values_list('date', 'count')
+        )
+        cls.objects.bulk_create(
+            [cls(user=user, date=date, completed_habits=completed_by_date.get(date, 0)) for date in dates],
+            update_conflicts=True,
+            unique_fields=['user', 'date'],
+            update_fields=['completed_habits'],
+        )
+
+    @classmethod
+    def remove_habit(cls, habit):
+        """Вычитает выполнения привычки из сводок одним запросом, вызывается до ее удаления"""
+        cls.objects.filter(
+            user_id=habit.user_id,
+            date__in=habit.logs.filter(completed=True).values('date'),
+            completed_habits__gt=0,
+        ).update(completed_habits=F('completed_habits') - 1)
+
+    @classmethod
+    def rebuild_for_user(cls, user):
+        """Пересчитывает сводки пользователя по истории отметок"""
+        rows = HabitLog.objects.filter(habit__user=user).order_by().values('date').annotate(
+            completed=Count('id', filter=Q(completed=True))
+        ).values_list('date', 'completed')
+
+        with transaction.atomic():
+            cls.objects.filter(user=user).delete()
+            cls.objects.bulk_create([
+                cls(user=user, date=date, completed_habits=completed)
+                for date, completed in rows.iterator()
+            ], batch_size=1000)
+
+
 class ReminderSettings(models.Model):
     """Настройки напоминаний для пользователя"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='reminder_settings')
@@ -104,10 +468,79 @@ class ReminderSettings(models.Model):
     email_notifications = models.BooleanField(default=True, verbose_name='Email уведомления')
     telegram_notifications = models.BooleanField(default=False, verbose_name='Telegram уведомления')
     telegram_chat_id = models.CharField(max_length=100, blank=True, verbose_name='Telegram Chat ID')
+    timezone = models.CharField(
+        max_length=64,
+        default=DEFAULT_TIMEZONE,
+        validators=[validate_timezone],
+        verbose_name='Часовой пояс'
+    )
+    # Ближайшее время отправки в UTC, пересчитывается при сохранении и после отправки
+    next_fire_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Выборка напоминаний, время которых подошло, и ближайшего следующего
+            models.Index(
+                fields=['next_fire_at'],
+                condition=Q(enabled=True),
+                name='reminder_next_fire_at'
+            ),
+        ]
 
     def __str__(self):
         return f"Напоминания для {self.user.username}"
 
+    def compute_next_fire_at(self, now=None):
+        """Ближайшее время напоминания после now или None, если напоминания выключены"""
+        if not self.enabled:
+            return None
+        return next_fire_time(self.reminder_time, self.timezone, now or timezone.now())
+
+    def save(self, *args, **kwargs):
+        # Значение по умолчанию '09:00' приходит строкой
+        self.reminder_time = self._meta.get_field('reminder_time').to_python(self.reminder_time)
+        self.next_fire_at = self.compute_next_fire_at()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'next_fire_at' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['next_fire_at']
+        super().save(*args, **kwargs)
+
+class AchievementThreshold(models.Model):
+    """Длина серии, за которую выдается достижение"""
+    CACHE_KEY = 'achievement_thresholds'
+    # clear_cache сбрасывает только кэш по умолчанию. С общим кэшем (Redis,
+    # Memcached) изменения видны всем процессам сразу, с LocMemCache у каждого
+    # процесса свой кэш, и другие процессы увидят их не позже чем через минуту
+    CACHE_TIMEOUT = 60
+
+    streak_length = models.PositiveIntegerField(unique=True, verbose_name='Длина серии')
+    title = models.CharField(max_length=200, verbose_name='Название достижения')
+
+    class Meta:
+        ordering = ['streak_length']
+
+    def __str__(self):
+        return f"{self.streak_length}: {self.title}"
+
+    @classmethod
+    def get_map(cls):
+        """Пороги {длина серии: название} из кэша; кэш сбрасывается при изменении таблицы"""
+        from django.core.cache import cache
+
+        return cache.get_or_set(
+            cls.CACHE_KEY,
+            lambda: dict(cls.objects.values_list('streak_length', 'title')),
+            cls.CACHE_TIMEOUT
+        )
+
+    @classmethod
+    def clear_cache(cls):
+        from django.core.cache import cache
+
+        cache.delete(cls.CACHE_KEY)
+
+
 class Achievement(models.Model):
     """Модель достижения"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='achievements')
@@ -116,43 +549,300 @@ class Achievement(models.Model):
     description = models.TextField(verbose_name='Описание')
     streak_length = models.PositiveIntegerField(verbose_name='Длина серии')
     achieved_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     image = models.ImageField(upload_to='achievements/', blank=True, null=True, verbose_name='Изображение')
     is_public = models.BooleanField(default=True, verbose_name='Публичное')
 
     class Meta:
         ordering = ['-achieved_at']
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'streak_length'], name='achievement_unique_habit_streak'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='achievement_user_updated_at'),
+            # Лента публичных достижений
+            models.Index(fields=['-achieved_at'], condition=Q(is_public=True), name='achievement_public_recent'),
+            # Достижения пользователя и лучшая серия
+            models.Index(fields=['user', '-streak_length'], name='achievement_user_streak'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Прежняя видимость нужна, чтобы обновить счетчик публичных достижений
+        instance._loaded_public = instance.__dict__.get('is_public')
+        return instance
+
+    @classmethod
+    def for_streak(cls, habit, streak_length, title):
+        """Несохраненное достижение привычки за серию streak_length"""
+        return cls(
+            user_id=habit.user_id,
+            habit=habit,
+            title=title,
+            description=f"Выполнял(а) привычку '{habit.name}' {streak_length} дней подряд!",
+            streak_length=streak_length
+        )
+
+    @classmethod
+    def create_for_habits(cls, habits):
+        """
+        Создает достижения привычкам, чья текущая серия совпала с порогом.
+
+        Вставка идет одним запросом с игнорированием конфликтов, поэтому
+        параллельные проверки не создают дубликатов.
+        """
+        thresholds = AchievementThreshold.get_map()
+        achievements = [
+            cls.for_streak(habit, habit.current_streak, thresholds[habit.current_streak])
+            for habit in habits
+            if habit.current_streak in thresholds
+        ]
+        if achievements:
+            cls.objects.bulk_create(achievements, ignore_conflicts=True)
+            # bulk_create не вызывает сигналы, счетчики пересчитываем сами
+            PublicAchievementCounter.refresh_users({achievement.user_id for achievement in achievements})
+        return len(achievements)
+
     @classmethod
     def check_and_create_achievements(cls, habit):
         """Проверяем и создаем достижения для привычки"""
-        streak = habit.get_current_streak()
-
-        # Достижения за разные длины серий
-        achievements_map = {
-            7: "Первая неделя!",
-            14: "Две недели подряд!",
-            21: "Три недели! Формируется привычка!",
-            30: "Месяц! Вы круты!",
-            60: "Два месяца! Невероятно!",
-            90: "Три месяца! Привычка сформирована!",
-        }
+        return cls.create_for_habits([habit])
 
-        if streak in achievements_map and not cls.objects.filter(
-            user=habit.user,
-            habit=habit,
-            streak_length=streak
-        ).exists():
-            # Создаем достижение
-            achievement = cls.objects.create(
-                user=habit.user,
-                habit=habit,
-                title=achievements_map[streak],
-                description=f"Выполнял(а) привычку '{habit.name}' {streak} дней подряд!",
-                streak_length=streak
+
+class PublicAchievementCounter(models.Model):
+    """
+    Число публичных достижений пользователя для таблицы лидеров.
+
+    Обновляется сигналами при создании, публикации и удалении достижений,
+    поэтому топ читается по индексу, а не группировкой всех достижений.
+    """
+    # Общее число нужно только пагинатору ленты, отставание на минуту допустимо
+    TOTAL_CACHE_KEY = 'public_achievements_total'
+    TOTAL_CACHE_TIMEOUT = 60
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='public_achievement_counter')
+    count = models.PositiveIntegerField(default=0, verbose_name='Публичных достижений')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count', 'user'], name='public_counter_top'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count}"
+
+    @classmethod
+    def add(cls, user_id, delta):
+        """Изменяет счетчик пользователя на delta"""
+        with transaction.atomic():
+            updated = cls.objects.filter(user_id=user_id).update(count=F('count') + delta)
+            if not updated:
+                counter, created = cls.objects.select_for_update().get_or_create(
+                    user_id=user_id,
+                    defaults={'count': max(delta, 0)}
+                )
+                if not created:
+                    counter.count = max(counter.count + delta, 0)
+                    counter.save(update_fields=['count'])
+
+    @classmethod
+    def refresh_users(cls, user_ids):
+        """Пересчитывает счетчики указанных пользователей одним запросом"""
+        if not user_ids:
+            return
+
+        counts = dict(
+            Achievement.objects.filter(user_id__in=user_ids, is_public=True).order_by().values(
+                'user_id'
+            ).annotate(count=Count('id')).values_list('user_id', 'count')
+        )
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, count=counts.get(user_id, 0)) for user_id in user_ids],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['count'],
+        )
+
+    @classmethod
+    def top(cls, limit=10):
+        """Лучшие пользователи по числу публичных достижений"""
+        return cls.objects.filter(count__gt=0).order_by('-count', 'user').values(
+            'user__username', 'count'
+        )[:limit]
+
+    @classmethod
+    def total(cls):
+        """Всего публичных достижений: сумма по счетчикам кэшируется на TOTAL_CACHE_TIMEOUT"""
+        from django.core.cache import cache
+
+        return cache.get_or_set(
+            cls.TOTAL_CACHE_KEY,
+            lambda: cls.objects.aggregate(total=models.Sum('count'))['total'] or 0,
+            cls.TOTAL_CACHE_TIMEOUT
+        )
+
+
+# Пользователи, чью версию нужно увеличить после коммита, в пределах потока
+_pending_versions = threading.local()
+
+
+class UserDataVersion(models.Model):
+    """
+    Версия данных пользователя для кэша ответов API.
+
+    Увеличивается один раз после коммита транзакции, записавшей привычки
+    или отметки пользователя, поэтому ответы, закэшированные под старой версией, больше не читаются.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
+
+    @classmethod
+    def bump(cls, user_id):
+        with transaction.atomic():
+            updated = cls.objects.filter(user_id=user_id).update(
+                version=F('version') + 1, updated_at=timezone.now()
             )
-            return achievement
+            if not updated:
+                version, created = cls.objects.select_for_update().get_or_create(
+                    user_id=user_id, defaults={'version': 1}
+                )
+                if not created:
+                    version.version += 1
+                    version.save(update_fields=['version', 'updated_at'])
+
+    @classmethod
+    def bump_on_commit(cls, user_id):
+        """
+        Увеличивает версию после коммита текущей транзакции.
+
+        Сколько бы записей пользователя ни было в транзакции, версия
+        увеличивается один раз; вне транзакции - сразу.
+        """
+        if not hasattr(_pending_versions, 'user_ids'):
+            _pending_versions.user_ids = set()
+        _pending_versions.user_ids.add(user_id)
+        # Колбэк у каждой записи: при откате точки сохранения пропадает только ее колбэк
+        transaction.on_commit(partial(cls._bump_pending, user_id))
+
+    @classmethod
+    def _bump_pending(cls, user_id):
+        # Первый колбэк пользователя увеличивает версию, остальные ничего не делают
+        if user_id in _pending_versions.user_ids:
+            _pending_versions.user_ids.discard(user_id)
+            cls.bump(user_id)
+
+    @classmethod
+    def get_state(cls, user_id):
+        """(версия, время последнего изменения) данных пользователя; (0, None), если записей еще не было"""
+        return cls.objects.filter(user_id=user_id).values_list('version', 'updated_at').first() or (0, None)
+
+
+class Tombstone(models.Model):
+    """Запись об удаленном объекте для дельта-синхронизации клиентов"""
+    HABIT = 'habit'
+    LOG = 'log'
+    ACHIEVEMENT = 'achievement'
+
+    MODEL_CHOICES = [
+        (HABIT, 'Привычка'),
+        (LOG, 'Отметка'),
+        (ACHIEVEMENT, 'Достижение'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} ({self.deleted_at})"
+
+
+class ReminderDelivery(models.Model):
+    """Журнал отправки напоминаний: не больше одного на пользователя в день"""
+    EMAIL = 'email'
+    TELEGRAM = 'telegram'
+
+    CHANNEL_CHOICES = [
+        (EMAIL, 'Email'),
+        (TELEGRAM, 'Telegram'),
+    ]
+
+    CLAIMED = 'claimed'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (CLAIMED, 'Взято в отправку'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminder_deliveries')
+    date = models.DateField()
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default=EMAIL)
+    claim = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=CLAIMED)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'date', 'channel']
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date} ({self.channel}): {self.status}"
+
+    @classmethod
+    def claim_users(cls, user_ids, date, channel=EMAIL):
+        """
+        Резервирует отправку за текущим процессом.
+
+        Возвращает ID пользователей, для которых запись создана этим
+        вызовом; остальным напоминание уже отправляет кто-то другой.
+        """
+        import uuid
+
+        if not user_ids:
+            return set()
+
+        claim = uuid.uuid4().hex
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, date=date, channel=channel, claim=claim) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        return set(
+            cls.objects.filter(
+                user_id__in=user_ids, date=date, channel=channel, claim=claim
+            ).values_list('user_id', flat=True)
+        )
+
+
+class ReminderWorker(models.Model):
+    """Живой процесс планировщика напоминаний"""
+    name = models.CharField(max_length=200, unique=True)
+    heartbeat_at = models.DateTimeField()
 
-        return None
\ No newline at end of file
+    def __str__(self):
+        return self.name
+
+
+class SchedulerLease(models.Model):
+    """Аренда шарда пользователей процессом планировщика"""
+    shard = models.PositiveIntegerField(unique=True)
+    owner = models.CharField(max_length=200, blank=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Шард {self.shard}: {self.owner or '-'}"
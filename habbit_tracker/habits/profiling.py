@@ -0,0 +1,126 @@
+"""
+Профилирование запросов: время ответа, время и число запросов к БД.
+
+ProfilingMiddleware подключается в MIDDLEWARE и охватывает и страницы,
+и API на DRF. Запросы к БД считаются через execute_wrapper: на каждый
+запрос к БД приходится замер времени и увеличение счетчика, поэтому
+профилирование можно не выключать.
+
+Персоналу и при DEBUG ответ получает заголовок Server-Timing,
+запросы дольше PROFILING_SLOW_REQUEST_MS пишутся в лог habits.profiling
+одной JSON-строкой вместе с самыми повторяющимися SQL.
+"""
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def profiling_settings():
+    return {
+        'enabled': getattr(settings, 'PROFILING_ENABLED', True),
+        'slow_request_ms': getattr(settings, 'PROFILING_SLOW_REQUEST_MS', 500),
+        'top_queries': getattr(settings, 'PROFILING_TOP_QUERIES', 5),
+    }
+
+
+class QueryProfile:
+    """Число, суммарное время и повторы запросов к БД в пределах одного HTTP-запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # Текст SQL без параметров: повтор одного шаблона - признак N+1
+        self.statements = Counter()
+        self.statement_durations = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.statements[sql] += 1
+            self.statement_durations[sql] += elapsed
+
+    @property
+    def duplicates(self):
+        return self.count - len(self.statements)
+
+    def top_repeated(self, limit):
+        return [
+            {
+                'sql': sql[:500],
+                'count': count,
+                'ms': round(self.statement_durations[sql] * 1000, 2),
+            }
+            for sql, count in self.statements.most_common(limit)
+            if count > 1
+        ]
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+def show_server_timing(request):
+    if settings.DEBUG:
+        return True
+    # DRF записывает пользователя, найденного по токену, и в исходный запрос
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = profiling_settings()
+        if not options['enabled']:
+            return self.get_response(request)
+
+        profile = QueryProfile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        # Профиль доступен и после ответа, например для метрик
+        request.profile = profile
+        request.profile_duration = total
+
+        if show_server_timing(request):
+            response['Server-Timing'] = (
+                f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries", '
+                f'app;dur={(total - profile.duration) * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        if total * 1000 >= options['slow_request_ms']:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': view_name(request),
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(profile.duration * 1000, 1),
+                'queries': profile.count,
+                'duplicates': profile.duplicates,
+                'top_repeated': profile.top_repeated(options['top_queries']),
+            }, ensure_ascii=False))
+
+        return response
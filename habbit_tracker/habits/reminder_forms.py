@@ -1,5 +1,6 @@
 from django import forms
 from .models import ReminderSettings
+from .reminders import timezone_choices
 
 
 class ReminderSettingsForm(forms.ModelForm):
@@ -7,10 +8,15 @@ class ReminderSettingsForm(forms.ModelForm):
         widget=forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
         label='Время напоминания'
     )
+    timezone = forms.ChoiceField(
+        choices=timezone_choices,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Часовой пояс'
+    )
 
     class Meta:
         model = ReminderSettings
-        fields = ['enabled', 'reminder_time', 'email_notifications']
+        fields = ['enabled', 'reminder_time', 'timezone', 'email_notifications']
         widgets = {
             'enabled': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'email_notifications': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
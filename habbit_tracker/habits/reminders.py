@@ -0,0 +1,32 @@
+"""Расчет времени напоминаний в часовом поясе пользователя"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+DEFAULT_TIMEZONE = 'UTC'
+
+
+def timezone_choices():
+    return [(name, name.replace('_', ' ')) for name in sorted(available_timezones())]
+
+
+def validate_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'Неизвестный часовой пояс: {value}')
+
+
+def next_fire_time(reminder_time, tz_name, now):
+    """
+    Ближайший момент после now (в UTC), когда в поясе tz_name наступает reminder_time.
+
+    Если при переходе на летнее время такого времени в этот день нет,
+    напоминание сдвигается вперед на величину перехода.
+    """
+    tz = ZoneInfo(tz_name)
+    day = now.astimezone(tz).date()
+    candidate = datetime.combine(day, reminder_time, tzinfo=tz).astimezone(dt_timezone.utc)
+    if candidate <= now:
+        candidate = datetime.combine(day + timedelta(days=1), reminder_time, tzinfo=tz).astimezone(dt_timezone.utc)
+    return candidate
@@ -0,0 +1,154 @@
+"""
+Кэш ответов API для чтения, привязанный к версии данных пользователя.
+
+Ключ включает пользователя, его UserDataVersion, текущую дату и параметры
+запроса. Запись привычки или отметки увеличивает версию, и старые ответы
+просто перестают читаться, а место под них освобождает вытеснение бэкенда.
+
+Хранилище - любой кэш Django из CACHES под псевдонимом RESPONSE_CACHE_ALIAS:
+LocMemCache и FileBasedCache ограничиваются OPTIONS['MAX_ENTRIES'],
+RedisCache - настройкой maxmemory и политикой вытеснения сервера.
+
+Та же версия служит валидатором для условных запросов: ETag
+считается без построения ответа.
+"""
+from collections import Counter
+from functools import wraps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+from .metrics import registry
+from .models import UserDataVersion
+import hashlib
+import pickle
+import threading
+
+
+def cache_settings():
+    return {
+        'alias': getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default'),
+        'timeout': getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300),
+        'max_entry_bytes': getattr(settings, 'RESPONSE_CACHE_MAX_ENTRY_BYTES', 256 * 1024),
+        'enabled': getattr(settings, 'RESPONSE_CACHE_ENABLED', True),
+    }
+
+
+class CacheMetrics:
+    """Счетчики попаданий и промахов по эндпоинтам в пределах процесса"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def incr(self, name, event):
+        with self.lock:
+            self.counts[name, event] += 1
+        # Общие для всех процессов счетчики для /metrics
+        registry.inc('habits_response_cache_events_total', {'endpoint': name, 'event': event})
+
+    def snapshot(self):
+        """{эндпоинт: {'hit': ..., 'miss': ..., 'store': ..., 'too_large': ...}}"""
+        with self.lock:
+            result = {}
+            for (name, event), count in self.counts.items():
+                result.setdefault(name, {})[event] = count
+            return result
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+metrics = CacheMetrics()
+
+
+def data_version(request):
+    """Версия данных пользователя, читается один раз за запрос"""
+    if not hasattr(request, '_data_version'):
+        request._data_version = UserDataVersion.get_state(request.user.pk)
+    return request._data_version
+
+
+def make_key(name, request, kwargs, version):
+    query = sorted(request.query_params.lists())
+    params = hashlib.md5(repr((sorted(kwargs.items()), query)).encode()).hexdigest()
+    return f'api:{name}:{request.user.pk}:{version}:{timezone.now().date().isoformat()}:{params}'
+
+
+def conditional_response(name):
+    """
+    Отвечает 304 на If-None-Match до вызова метода.
+
+    ETag строится из ключа кэша и формата ответа. Last-Modified не
+    отдается: с точностью до секунды он не отличает запись, сделанную
+    в ту же секунду, что и прочитанный ответ, и клиент получил бы 304
+    на устаревшие данные.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(self, request, *args, **kwargs)
+
+            version, _ = data_version(request)
+            key = make_key(name, request, kwargs, version)
+            etag = quote_etag(hashlib.md5(f'{key}:{request.accepted_media_type}'.encode()).hexdigest())
+
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            else:
+                response = not_modified
+
+            response['ETag'] = etag
+            # Данные личные: общие кэши их не хранят, клиент перепроверяет каждый раз
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_response(name):
+    """
+    Кэширует данные успешного ответа метода APIView или действия ViewSet.
+
+    Повторный запрос с той же версией данных отдается из кэша
+    за один запрос к БД (чтение версии).
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            options = cache_settings()
+            if not options['enabled']:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = caches[options['alias']]
+            version, _ = data_version(request)
+            key = make_key(name, request, kwargs, version)
+
+            payload = cache.get(key)
+            if payload is not None:
+                metrics.incr(name, 'hit')
+                response = Response(pickle.loads(payload))
+                response['X-Cache'] = 'HIT'
+                return response
+
+            metrics.incr(name, 'miss')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                # Крупные ответы не кэшируем, чтобы они не вытесняли остальные
+                payload = pickle.dumps(response.data, pickle.HIGHEST_PROTOCOL)
+                if len(payload) <= options['max_entry_bytes']:
+                    cache.set(key, payload, options['timeout'])
+                    metrics.incr(name, 'store')
+                else:
+                    metrics.incr(name, 'too_large')
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
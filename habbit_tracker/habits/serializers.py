@@ -1,6 +1,52 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from django.contrib.auth.models import User
-from .models import Habit, HabitLog
+from django.utils.dateparse import parse_date
+from .models import Achievement, Habit, HabitLog
+
+EMBEDDED_LOGS_LIMIT = 30
+MAX_EMBEDDED_LOGS_LIMIT = 366
+
+
+def parse_fields(request):
+    """Набор полей из ?fields=id,name или None, если параметр не передан"""
+    fields = request.query_params.get('fields') if request is not None else None
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+def parse_log_embedding(request):
+    """
+    Параметры встраивания логов: (logs_since, limit) или None,
+    если логи не запрошены через ?include=logs.
+    """
+    if request is None:
+        return None
+    include = request.query_params.get('include', '')
+    if 'logs' not in {name.strip() for name in include.split(',')}:
+        return None
+
+    since = request.query_params.get('logs_since')
+    if since:
+        since = parse_date(since)
+        if since is None:
+            raise serializers.ValidationError({'logs_since': 'Ожидается дата в формате YYYY-MM-DD'})
+
+    try:
+        limit = int(request.query_params.get('logs_limit', EMBEDDED_LOGS_LIMIT))
+    except ValueError:
+        raise serializers.ValidationError({'logs_limit': 'Ожидается целое число'})
+
+    return since or None, min(max(limit, 1), MAX_EMBEDDED_LOGS_LIMIT)
+
+
+def embedded_logs_queryset(since):
+    """Логи для встраивания в привычку, новые первыми"""
+    logs = HabitLog.objects.order_by('-date')
+    if since:
+        logs = logs.filter(date__gte=since)
+    return logs
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,9 +62,37 @@ class HabitLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class SyncHabitLogSerializer(serializers.ModelSerializer):
+    """Отметка для синхронизации: с привычкой и временем изменения"""
+    class Meta:
+        model = HabitLog
+        fields = ['id', 'habit', 'date', 'completed', 'notes', 'updated_at']
+
+
+class AchievementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Achievement
+        fields = [
+            'id', 'habit', 'title', 'description', 'streak_length',
+            'achieved_at', 'is_public', 'updated_at'
+        ]
+
+
+class BulkHabitLogSerializer(serializers.Serializer):
+    """Элемент пакетной записи отметок: полное состояние дня"""
+    habit = serializers.IntegerField()
+    date = serializers.DateField()
+    completed = serializers.BooleanField(default=False)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class HabitSerializer(serializers.ModelSerializer):
+    """
+    Логи встраиваются только по ?include=logs (с logs_since и logs_limit),
+    ?fields= оставляет в ответе только перечисленные поля.
+    """
     user = UserSerializer(read_only=True)
-    logs = HabitLogSerializer(many=True, read_only=True)
+    logs = serializers.SerializerMethodField()
     current_streak = serializers.SerializerMethodField()
     completion_rate = serializers.SerializerMethodField()
 
@@ -26,10 +100,34 @@ class HabitSerializer(serializers.ModelSerializer):
         model = Habit
         fields = [
             'id', 'user', 'name', 'description', 'frequency',
-            'target', 'created_at', 'is_active', 'logs',
+            'target', 'created_at', 'updated_at', 'is_active', 'logs',
             'current_streak', 'completion_rate'
         ]
-        read_only_fields = ['id', 'user', 'created_at']
+        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        self.log_embedding = parse_log_embedding(request)
+
+        # Выборка полей только для чтения, чтобы не терять входные данные
+        requested = parse_fields(request) if request is not None and request.method in SAFE_METHODS else None
+        if self.log_embedding is None:
+            self.fields.pop('logs')
+        elif requested is not None:
+            requested.add('logs')
+
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    def get_logs(self, obj):
+        since, limit = self.log_embedding
+        # Обычно логи уже подгружены во вьюсете через Prefetch
+        logs = getattr(obj, 'embedded_logs', None)
+        if logs is None:
+            logs = embedded_logs_queryset(since).filter(habit=obj)[:limit]
+        return HabitLogSerializer(logs, many=True).data
 
     def get_current_streak(self, obj):
         return obj.get_current_streak()
@@ -0,0 +1,85 @@
+"""Распределение напоминаний между процессами планировщика через аренды в БД"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from .models import ReminderWorker, SchedulerLease
+import hashlib
+import os
+import socket
+import uuid
+
+
+def shard_count():
+    return getattr(settings, 'REMINDER_SHARDS', 16)
+
+
+def lease_ttl():
+    return timedelta(seconds=getattr(settings, 'REMINDER_LEASE_TTL', 90))
+
+
+def make_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def preferred_owner(shard, workers):
+    """Владелец шарда по rendezvous-хешированию: одинаков во всех процессах"""
+    return max(workers, key=lambda worker: hashlib.md5(f'{worker}:{shard}'.encode()).digest())
+
+
+class ShardCoordinator:
+    """
+    Аренды шардов для одного процесса планировщика.
+
+    Пользователь попадает в шард user_id % REMINDER_SHARDS. Каждый живой
+    процесс забирает шарды, для которых он предпочтительный владелец
+    среди живых, и отпускает остальные. Шарды умершего процесса
+    освобождаются по истечении аренды (REMINDER_LEASE_TTL).
+    """
+
+    def __init__(self, worker_id=None, shards=None, ttl=None):
+        self.worker_id = worker_id or make_worker_id()
+        self.shards = shards or shard_count()
+        self.ttl = ttl or lease_ttl()
+
+    def heartbeat(self, now):
+        ReminderWorker.objects.update_or_create(name=self.worker_id, defaults={'heartbeat_at': now})
+        # Давно молчащие процессы больше не участвуют в распределении
+        ReminderWorker.objects.filter(heartbeat_at__lt=now - self.ttl * 10).delete()
+
+    def live_workers(self, now):
+        return list(
+            ReminderWorker.objects.filter(heartbeat_at__gt=now - self.ttl).values_list('name', flat=True)
+        )
+
+    def acquire(self, now):
+        """Обновляет аренды и возвращает шарды, которыми процесс владеет сейчас"""
+        self.heartbeat(now)
+
+        SchedulerLease.objects.bulk_create(
+            [SchedulerLease(shard=shard, expires_at=now) for shard in range(self.shards)],
+            ignore_conflicts=True,
+        )
+
+        workers = self.live_workers(now)
+        if self.worker_id not in workers:
+            workers.append(self.worker_id)
+        desired = [
+            shard for shard in range(self.shards)
+            if preferred_owner(shard, workers) == self.worker_id
+        ]
+
+        expires_at = now + self.ttl
+        SchedulerLease.objects.filter(owner=self.worker_id).exclude(shard__in=desired).update(
+            owner='', expires_at=now
+        )
+        # Забираем свои шарды, если они свободны, или продлеваем уже свои
+        SchedulerLease.objects.filter(shard__in=desired).filter(
+            Q(owner=self.worker_id) | Q(expires_at__lte=now)
+        ).update(owner=self.worker_id, expires_at=expires_at)
+
+        return list(SchedulerLease.objects.filter(owner=self.worker_id, expires_at__gt=now).order_by('shard'))
+
+    def release(self, now):
+        """Отпускает все шарды процесса, например при остановке"""
+        SchedulerLease.objects.filter(owner=self.worker_id).update(owner='', expires_at=now)
+        ReminderWorker.objects.filter(name=self.worker_id).delete()
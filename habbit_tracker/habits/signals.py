@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import ReminderSettings
+from .models import (
+    Achievement, AchievementThreshold, DailyStats, Habit, HabitLog, HabitYearBitmap,
+    PublicAchievementCounter, ReminderSettings, Tombstone, UserDataVersion
+)
+
+
+def origin_model(origin):
+    """Модель объекта или QuerySet, с удаления которого начался каскад"""
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
 
 
 @receiver(post_save, sender=User)
@@ -14,4 +23,107 @@ def create_reminder_settings(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_reminder_settings(sender, instance, **kwargs):
     """Сохраняем настройки напоминаний"""
-    instance.reminder_settings.save()
\ No newline at end of file
+    instance.reminder_settings.save()
+
+
+@receiver(post_delete, sender=HabitLog)
+def update_streaks_on_log_delete(sender, instance, origin=None, **kwargs):
+    """Обновляем серии, битовые карты и дневную сводку при удалении отметки"""
+    # Серии и битовые карты удаляются вместе с привычкой,
+    # сводку за ее отметки уже поправил update_daily_stats_on_habit_delete
+    if origin_model(origin) in (User, Habit):
+        return
+
+    habit = Habit.objects.filter(pk=instance.habit_id).first()
+    if habit is not None:
+        habit.update_streak_state(instance.date, instance.completed, None)
+        HabitYearBitmap.set_day(habit.pk, instance.date, None)
+        if instance.completed:
+            DailyStats.add_completed(habit.user_id, instance.date, -1)
+
+
+@receiver(pre_delete, sender=Habit)
+def update_daily_stats_on_habit_delete(sender, instance, origin=None, **kwargs):
+    """Убираем выполнения удаляемой привычки из дневной сводки"""
+    # Сводки удаляются вместе с пользователем
+    if origin_model(origin) is User:
+        return
+    DailyStats.remove_habit(instance)
+
+
+@receiver(post_delete, sender=Habit)
+@receiver(post_delete, sender=HabitLog)
+@receiver(post_delete, sender=Achievement)
+def create_tombstone(sender, instance, origin=None, **kwargs):
+    """Запоминаем удаление, чтобы отдать его клиентам при синхронизации"""
+    # Вместе с пользователем удаляются и его надгробия
+    if origin_model(origin) is User:
+        return
+    # Отметки и достижения удаленной привычки клиент удаляет вместе с ней,
+    # отдельное надгробие на каждую отметку не нужно
+    if origin_model(origin) is Habit and sender is not Habit:
+        return
+
+    if sender is HabitLog:
+        user_id = Habit.objects.filter(pk=instance.habit_id).values_list('user_id', flat=True).first()
+        model = Tombstone.LOG
+    else:
+        user_id = instance.user_id
+        model = Tombstone.HABIT if sender is Habit else Tombstone.ACHIEVEMENT
+
+    if user_id is not None:
+        Tombstone.objects.create(user_id=user_id, model=model, object_id=instance.pk)
+
+
+@receiver(post_save, sender=AchievementThreshold)
+@receiver(post_delete, sender=AchievementThreshold)
+def clear_achievement_thresholds_cache(sender, **kwargs):
+    """Сбрасываем кэш порогов достижений при их изменении"""
+    AchievementThreshold.clear_cache()
+
+
+@receiver(post_save, sender=Achievement)
+def update_public_counter_on_save(sender, instance, created, **kwargs):
+    """Обновляем счетчик публичных достижений при создании и смене видимости"""
+    previous = getattr(instance, '_loaded_public', None)
+
+    if created:
+        if instance.is_public:
+            PublicAchievementCounter.add(instance.user_id, 1)
+    elif previous is None:
+        # Прежняя видимость неизвестна
+        PublicAchievementCounter.refresh_users([instance.user_id])
+    elif previous != instance.is_public:
+        PublicAchievementCounter.add(instance.user_id, 1 if instance.is_public else -1)
+
+    instance._loaded_public = instance.is_public
+
+
+@receiver(post_delete, sender=Achievement)
+def update_public_counter_on_delete(sender, instance, origin=None, **kwargs):
+    """Уменьшаем счетчик при удалении публичного достижения"""
+    # Счетчик удаляется вместе с пользователем
+    if origin_model(origin) is User or not instance.is_public:
+        return
+    PublicAchievementCounter.add(instance.user_id, -1)
+
+
+@receiver(post_save, sender=Habit)
+@receiver(post_save, sender=HabitLog)
+@receiver(post_delete, sender=Habit)
+@receiver(post_delete, sender=HabitLog)
+def bump_data_version(sender, instance, origin=None, **kwargs):
+    """Увеличиваем версию данных пользователя, чтобы сбросить кэш ответов API"""
+    # При каскадном удалении версию увеличивает удаление привычки
+    if origin_model(origin) in (User, Habit) and origin_model(origin) is not sender:
+        return
+
+    if sender is Habit:
+        user_id = instance.user_id
+    elif HabitLog.habit.is_cached(instance):
+        user_id = instance.habit.user_id
+    else:
+        user_id = Habit.objects.filter(pk=instance.habit_id).values_list('user_id', flat=True).first()
+
+    if user_id is not None:
+        UserDataVersion.bump_on_commit(user_id)
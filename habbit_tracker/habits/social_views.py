@@ -2,13 +2,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from .models import Achievement, Habit
+from django.utils.functional import cached_property
+from .models import Achievement, Habit, PublicAchievementCounter
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор с заранее известным числом объектов вместо COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        return self.known_count
 
 
 @login_required
 def achievements_list(request):
     """Список достижений пользователя"""
-    achievements = Achievement.objects.filter(user=request.user)
+    # Шаблон выводит название привычки у каждого достижения
+    achievements = Achievement.objects.filter(user=request.user).select_related('habit')
 
     # Статистика
     total_achievements = achievements.count()
@@ -26,20 +40,13 @@ def public_achievements(request):
     """Публичные достижения всех пользователей"""
     achievements = Achievement.objects.filter(is_public=True).select_related('user', 'habit')
 
-    # Пагинация
-    paginator = Paginator(achievements, 10)
+    # Пагинация: общее число берем из счетчиков, а не COUNT(*) по достижениям
+    paginator = CountedPaginator(achievements, 10, count=PublicAchievementCounter.total())
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    # Топ пользователей по количеству достижений
-    from django.db.models import Count
-    top_users = Achievement.objects.filter(
-        is_public=True
-    ).values(
-        'user__username'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
+    # Топ пользователей по количеству достижений из счетчиков
+    top_users = PublicAchievementCounter.top(10)
 
     return render(request, 'habits/public_achievements.html', {
         'page_obj': page_obj,
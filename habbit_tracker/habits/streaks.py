@@ -0,0 +1,34 @@
+"""Расчет серий выполнения привычки"""
+
+
+def calculate_streak_state(rows):
+    """
+    Состояние серий по отметкам (date, completed), отсортированным по дате.
+
+    Серию прерывает только явная отметка о невыполнении,
+    дни без отметок ее не обрывают. previous_best_streak - лучшая
+    из завершенных серий, без текущей.
+    """
+    current_streak = 0
+    best_streak = 0
+    previous_best_streak = 0
+    last_completed_date = None
+    last_missed_date = None
+
+    for date, completed in rows:
+        if completed:
+            current_streak += 1
+            best_streak = max(best_streak, current_streak)
+            last_completed_date = date
+        else:
+            previous_best_streak = max(previous_best_streak, current_streak)
+            current_streak = 0
+            last_missed_date = date
+
+    return {
+        'current_streak': current_streak,
+        'best_streak': best_streak,
+        'previous_best_streak': previous_best_streak,
+        'last_completed_date': last_completed_date,
+        'last_missed_date': last_missed_date,
+    }
@@ -0,0 +1,69 @@
+"""Дельта-синхронизация: токены и выборка изменений с момента токена"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from .models import Achievement, Habit, HabitLog, Tombstone
+
+# Перекрытие окна на случай транзакций, закоммиченных позже своего updated_at
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+
+
+def make_token(moment):
+    """Непрозрачный токен: микросекунды с начала эпохи"""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_token(token):
+    """Момент времени из токена или None, если токен некорректен"""
+    try:
+        microseconds = int(token)
+    except (TypeError, ValueError):
+        return None
+    if microseconds < 0:
+        return None
+    try:
+        return datetime.fromtimestamp(microseconds / 1_000_000, tz=dt_timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        # Момент за пределами диапазона datetime
+        return None
+
+
+def collect_changes(user, since=None):
+    """
+    Изменения пользователя после since (None - полная выгрузка).
+
+    Если since старше срока хранения надгробий, удаления могли быть
+    потеряны, поэтому отдается полная выгрузка с reset=True.
+    """
+    now = timezone.now()
+    if since is not None and since < now - tombstone_retention():
+        since = None
+
+    habits = Habit.objects.filter(user=user).select_related('user').with_log_stats()
+    logs = HabitLog.objects.filter(habit__user=user)
+    achievements = Achievement.objects.filter(user=user)
+    tombstones = Tombstone.objects.none()
+
+    if since is not None:
+        window_start = since - SYNC_OVERLAP
+        habits = habits.filter(updated_at__gt=window_start)
+        logs = logs.filter(updated_at__gt=window_start)
+        achievements = achievements.filter(updated_at__gt=window_start)
+        tombstones = Tombstone.objects.filter(user=user, deleted_at__gt=window_start)
+
+    deleted = {Tombstone.HABIT: [], Tombstone.LOG: [], Tombstone.ACHIEVEMENT: []}
+    for model, object_id in tombstones.values_list('model', 'object_id'):
+        deleted[model].append(object_id)
+
+    return {
+        'token': make_token(now),
+        'reset': since is None,
+        'habits': habits,
+        'logs': logs,
+        'achievements': achievements,
+        'deleted': deleted,
+    }
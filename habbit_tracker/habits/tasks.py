@@ -1,64 +1,41 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from django_apscheduler.jobstores import DjangoJobStore, register_events
 from django_apscheduler.models import DjangoJobExecution
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.db.models import Prefetch
+from django.db.models.functions import Mod
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import Habit, ReminderSettings
+from datetime import datetime, timedelta, timezone as dt_timezone
+from collections import defaultdict
+from .models import Habit, HabitLog, ReminderDelivery, ReminderSettings
+from .mailer import deliver_messages
+from .metrics import registry
+from .telegram import TelegramMessage, deliver_telegram_messages, telegram_settings
+from .sharding import ShardCoordinator, shard_count
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
 
-def send_daily_reminders():
-    """Отправка ежедневных напоминаний"""
-    today = timezone.now().date()
+# Сколько пользователей загружается и отправляется за раз
+REMINDER_CHUNK_SIZE = 500
 
-    # Получаем всех пользователей с включенными напоминаниями
-    reminder_settings = ReminderSettings.objects.filter(
-        enabled=True,
-        email_notifications=True
-    )
+# Напоминания, пропущенные дольше этого (планировщик стоял), не досылаются
+MAX_CATCH_UP = timedelta(hours=1)
 
-    for settings in reminder_settings:
-        user = settings.user
-        current_time = timezone.now().time()
+# Через сколько повторить запуск после ошибки
+RETRY_DELAY = timedelta(seconds=30)
 
-        # Проверяем время напоминания (плюс-минус 5 минут)
-        reminder_time = settings.reminder_time
-        time_diff = abs(
-            (current_time.hour * 60 + current_time.minute) -
-            (reminder_time.hour * 60 + reminder_time.minute)
-        )
-
-        if time_diff <= 5:  # Время для отправки
-            # Получаем активные привычки пользователя
-            habits = Habit.objects.filter(user=user, is_active=True)
-
-            if not habits.exists():
-                continue
-
-            # Формируем список привычек для сегодня
-            habits_to_remind = []
-            for habit in habits:
-                # Проверяем, не отмечена ли уже привычка сегодня
-                already_logged = habit.logs.filter(date=today).exists()
-                if not already_logged:
-                    habits_to_remind.append(habit)
-
-            if habits_to_remind:
-                try:
-                    # Отправляем email
-                    subject = '⏰ Напоминание о привычках'
 
-                    # Формируем список привычек
-                    habit_list = '\n'.join([
-                        f'• {habit.name}' for habit in habits_to_remind
-                    ])
+def build_reminder_text(user, habits, habits_to_remind):
+    """Текст напоминания со списком неотмеченных привычек"""
+    # Формируем список привычек
+    habit_list = '\n'.join([
+        f'• {habit.name}' for habit in habits_to_remind
+    ])
 
-                    message = f'''
+    message = f'''
 Привет, {user.username}!
 
 Не забудьте выполнить свои привычки на сегодня:
@@ -66,48 +43,236 @@ def send_daily_reminders():
 {habit_list}
 
 Текущая статистика:
-{', '.join([f'{h.name}: {h.get_current_streak()} дней подряд' for h in habits])}
+{', '.join([f'{h.name}: {h.current_streak} дней подряд' for h in habits])}
 
 Перейдите в приложение, чтобы отметить выполнение:
 http://localhost:8000/
 
 Сделайте сегодняшний день продуктивным! 💪
-                    '''
+    '''
+
+    return message.strip()
+
+
+def build_reminder_message(user, habits, habits_to_remind):
+    """Письмо-напоминание со списком неотмеченных привычек"""
+    subject = '⏰ Напоминание о привычках'
+    text = build_reminder_text(user, habits, habits_to_remind)
+    return EmailMessage(subject, text, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+# Функции отправки по каналам: (сообщения, failures=[]) -> (отправлено, ошибок)
+CHANNEL_SENDERS = {
+    ReminderDelivery.EMAIL: deliver_messages,
+    ReminderDelivery.TELEGRAM: deliver_telegram_messages,
+}
+
+
+def deliver_reminders(pending, today, channel=ReminderDelivery.EMAIL):
+    """
+    Отправляет напоминания по каналу, возвращает число отправленных.
+
+    pending - пары (пользователь, сообщение). Перед отправкой каждая
+    резервируется в журнале, поэтому напоминание уходит не больше
+    одного раза в день, даже если шард обработали два процесса.
+    """
+    if not pending:
+        return 0
+
+    claimed = ReminderDelivery.claim_users([user.pk for user, _ in pending], today, channel)
+    messages = {user.pk: message for user, message in pending if user.pk in claimed}
+    if not messages:
+        return 0
+
+    failures = []
+    sent, failed = CHANNEL_SENDERS[channel](list(messages.values()), failures=failures)
+
+    failed_messages = {id(message) for message in failures}
+    failed_ids = [user_id for user_id, message in messages.items() if id(message) in failed_messages]
+    deliveries = ReminderDelivery.objects.filter(user_id__in=messages, date=today, channel=channel)
+    deliveries.exclude(user_id__in=failed_ids).update(status=ReminderDelivery.SENT)
+    if failed_ids:
+        deliveries.filter(user_id__in=failed_ids).update(status=ReminderDelivery.FAILED)
+
+    registry.inc('habits_reminder_sent_total', {'channel': channel}, sent)
+    registry.inc('habits_reminder_failed_total', {'channel': channel}, failed)
+    logger.info(f'Отправлено напоминаний ({channel}): {sent}, ошибок: {failed}')
+    return sent
+
+
+def send_daily_reminders(now=None, shards=None, users=None):
+    """
+    Отправка напоминаний, время которых (next_fire_at) уже наступило.
+
+    После обработки next_fire_at переносится на следующий день
+    в часовом поясе пользователя. shards - номера шардов
+    (user_id % REMINDER_SHARDS) этого процесса, None - все пользователи.
+    users - только эти пользователи (список или QuerySet), например для замеров.
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    sent = 0
+    scanned = 0
+    # Насколько самое старое из подошедших напоминаний опоздало
+    lag = 0.0
+    # Без токена бота Telegram-напоминания не отправляются
+    telegram_enabled = bool(telegram_settings()['token'])
+    # Отметки за день напоминания и за день до него (запуск мог сдвинуться на полночь)
+    dates = (now.date() - timedelta(days=1), now.date())
 
-                    send_mail(
-                        subject,
-                        message.strip(),
-                        settings.DEFAULT_FROM_EMAIL,
-                        [user.email],
-                        fail_silently=False,
-                    )
+    # Подошедшие напоминания выбираются по индексу next_fire_at; привычки и
+    # отметки за последние дни подгружаются пачками вместе с ними
+    reminders = ReminderSettings.objects.filter(enabled=True, next_fire_at__lte=now)
+    if shards is not None:
+        reminders = reminders.alias(shard=Mod('user_id', shard_count())).filter(shard__in=shards)
+    if users is not None:
+        reminders = reminders.filter(user__in=users)
 
-                    logger.info(f'Отправлено напоминание пользователю {user.email}')
+    reminders = reminders.select_related('user').prefetch_related(
+        Prefetch(
+            'user__habits',
+            queryset=Habit.objects.filter(is_active=True).prefetch_related(
+                Prefetch(
+                    'logs',
+                    queryset=HabitLog.objects.filter(date__range=dates).only('habit_id', 'date'),
+                    to_attr='recent_logs'
+                )
+            ),
+            to_attr='active_habits'
+        )
+    ).order_by('pk')
+
+    # Журнал отправок ведется по дате напоминания, поэтому пачки
+    # разделены по каналу и дате
+    pending = defaultdict(list)
+    rescheduled = []
+    for reminder in reminders.iterator(chunk_size=REMINDER_CHUNK_SIZE):
+        fire_at = reminder.next_fire_at
+        reminder.next_fire_at = reminder.compute_next_fire_at(now)
+        rescheduled.append(reminder)
+        scanned += 1
+        lag = max(lag, (now - fire_at).total_seconds())
+
+        user = reminder.user
+        habits = user.active_habits
+        if now - fire_at > MAX_CATCH_UP or not habits:
+            continue
+
+        # Формируем список привычек, еще не отмеченных в день напоминания.
+        # Отметки пишутся по дате UTC (timezone.now().date()), с ней и сравниваем
+        today = fire_at.astimezone(dt_timezone.utc).date()
+        habits_to_remind = [
+            habit for habit in habits
+            if not any(log.date == today for log in habit.recent_logs)
+        ]
+        if not habits_to_remind:
+            continue
+
+        if reminder.email_notifications:
+            pending[ReminderDelivery.EMAIL, today].append(
+                (user, build_reminder_message(user, habits, habits_to_remind))
+            )
+        if reminder.telegram_notifications and reminder.telegram_chat_id and telegram_enabled:
+            text = build_reminder_text(user, habits, habits_to_remind)
+            pending[ReminderDelivery.TELEGRAM, today].append(
+                (user, TelegramMessage(reminder.telegram_chat_id, text))
+            )
+
+        # Отправляем накопленные сообщения пачками, не держа всю рассылку в памяти
+        for (channel, date), messages in list(pending.items()):
+            if len(messages) >= REMINDER_CHUNK_SIZE:
+                sent += deliver_reminders(pending.pop((channel, date)), date, channel)
+        if len(rescheduled) >= REMINDER_CHUNK_SIZE:
+            ReminderSettings.objects.bulk_update(rescheduled, ['next_fire_at'])
+            rescheduled = []
+
+    for (channel, date), messages in pending.items():
+        sent += deliver_reminders(messages, date, channel)
+    ReminderSettings.objects.bulk_update(rescheduled, ['next_fire_at'])
+
+    registry.observe('habits_reminder_run_duration_seconds', time.perf_counter() - started)
+    registry.inc('habits_reminder_users_scanned_total', value=scanned)
+    registry.set('habits_reminder_queue_lag_seconds', lag)
+    registry.set('habits_reminder_last_run_timestamp_seconds', now.timestamp())
+    # Планировщик - отдельный процесс, его метрики записываем после каждого запуска
+    registry.flush(force=True)
+    return sent
+
+
+def next_reminder_at(shards):
+    """Ближайшее запланированное напоминание в шардах, первая запись индекса next_fire_at"""
+    return ReminderSettings.objects.filter(
+        enabled=True, next_fire_at__isnull=False
+    ).alias(shard=Mod('user_id', shard_count())).filter(
+        shard__in=shards
+    ).order_by('next_fire_at').values_list('next_fire_at', flat=True).first()
 
-                except Exception as e:
-                    logger.error(f'Ошибка отправки напоминания: {e}')
+
+# Координатор шардов текущего процесса планировщика
+_coordinator = None
+
+
+def run_reminder_shards(now=None):
+    """
+    Рассылка по шардам, арендованным этим процессом.
+
+    Возвращает, когда запускаться в следующий раз: к ближайшему
+    напоминанию, но не позже, чем пора продлевать аренды.
+    """
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = ShardCoordinator()
+
+    now = now or timezone.now()
+    shards = [lease.shard for lease in _coordinator.acquire(now)]
+    wake_at = now + _coordinator.ttl / 3
+
+    if shards:
+        send_daily_reminders(now=now, shards=shards)
+        next_at = next_reminder_at(shards)
+        if next_at is not None:
+            wake_at = max(min(wake_at, next_at), now)
+    return wake_at
 
 
 def start_scheduler():
-    """Запуск планировщика задач"""
+    """
+    Запуск планировщика задач.
+
+    Можно запускать несколько процессов: шарды пользователей делятся
+    между ними через аренды в БД, поэтому задачи хранятся в памяти
+    каждого процесса, а не в общем DjangoJobStore.
+    """
+    global _coordinator
+    _coordinator = ShardCoordinator()
+
     scheduler = BackgroundScheduler()
-    scheduler.add_jobstore(DjangoJobStore(), "default")
 
-    # Добавляем задачу отправки напоминаний каждый час
-    scheduler.add_job(
-        send_daily_reminders,
-        'interval',
-        hours=1,
-        id='daily_reminders',
-        replace_existing=True
-    )
+    def run_and_reschedule():
+        try:
+            wake_at = run_reminder_shards()
+        except Exception:
+            logger.exception('Ошибка при рассылке напоминаний')
+            registry.inc('habits_reminder_run_errors_total')
+            registry.flush(force=True)
+            wake_at = timezone.now() + RETRY_DELAY
+
+        # Следующий запуск ровно к ближайшему напоминанию
+        scheduler.add_job(
+            run_and_reschedule,
+            'date',
+            run_date=wake_at,
+            id='daily_reminders',
+            replace_existing=True,
+            misfire_grace_time=None
+        )
 
-    # Регистрируем события в Django
-    register_events(scheduler)
+    # Первый запуск сразу после старта
+    scheduler.add_job(run_and_reschedule, 'date', id='daily_reminders', replace_existing=True)
 
     # Запускаем планировщик
     scheduler.start()
-    logger.info("Планировщик задач запущен")
+    logger.info(f"Планировщик задач запущен ({_coordinator.worker_id})")
 
     try:
         # Это держит приложение живым
@@ -115,4 +280,5 @@ def start_scheduler():
             time.sleep(1)
     except KeyboardInterrupt:
         scheduler.shutdown()
-        logger.info("Планировщик задач остановлен")
\ No newline at end of file
+        _coordinator.release(timezone.now())
+        logger.info("Планировщик задач остановлен")
@@ -0,0 +1,122 @@
+"""Асинхронная отправка сообщений через Telegram Bot API"""
+from collections import namedtuple
+from django.conf import settings
+import aiohttp
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+TelegramMessage = namedtuple('TelegramMessage', ['chat_id', 'text'])
+
+
+def telegram_settings():
+    """
+    Параметры отправки из настроек Django с значениями по умолчанию.
+
+    Bot API пропускает около 30 сообщений в секунду на бота,
+    поэтому по умолчанию скорость ограничена этим значением.
+    """
+    return {
+        'token': getattr(settings, 'TELEGRAM_BOT_TOKEN', ''),
+        'api_url': getattr(settings, 'TELEGRAM_API_URL', 'https://api.telegram.org'),
+        'rate': getattr(settings, 'TELEGRAM_RATE_LIMIT', 30),
+        'concurrency': getattr(settings, 'TELEGRAM_CONCURRENCY', 20),
+        'max_attempts': getattr(settings, 'TELEGRAM_MAX_ATTEMPTS', 3),
+        'timeout': getattr(settings, 'TELEGRAM_TIMEOUT', 10),
+    }
+
+
+class TokenBucket:
+    """
+    Ограничитель скорости: не больше rate запросов в секунду
+    с накоплением до capacity запросов подряд.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Запрещает отправку на seconds секунд (ответ 429 от Bot API)"""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+async def send_message(session, url, bucket, message, max_attempts=3):
+    """Отправляет одно сообщение, повторяя при 429 и сетевых ошибках"""
+    for attempt in range(1, max_attempts + 1):
+        await bucket.acquire()
+        try:
+            async with session.post(url, json={'chat_id': message.chat_id, 'text': message.text}) as response:
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            error = str(e) or e.__class__.__name__
+        else:
+            if data.get('ok'):
+                return True
+            error = data.get('description', response.status)
+            retry_after = data.get('parameters', {}).get('retry_after')
+            if retry_after:
+                bucket.pause(retry_after)
+            elif response.status < 500:
+                # Неверный chat_id или бот заблокирован: повтор не поможет
+                break
+
+    logger.error(f'Не удалось отправить сообщение в Telegram {message.chat_id}: {error}')
+    return False
+
+
+async def send_messages_async(messages, token, api_url, rate, concurrency, max_attempts=3, timeout=10):
+    """
+    Отправляет сообщения конкурентно через одну HTTP-сессию.
+
+    Возвращает список признаков успеха в порядке messages.
+    """
+    url = f'{api_url.rstrip("/")}/bot{token}/sendMessage'
+    bucket = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(session, message):
+        async with semaphore:
+            return await send_message(session, url, bucket, message, max_attempts)
+
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(timeout=client_timeout, connector=connector) as session:
+        return await asyncio.gather(*(send(session, message) for message in messages))
+
+
+def deliver_telegram_messages(messages, failures=None, **options):
+    """
+    Синхронная обертка для планировщика.
+
+    Неотправленные сообщения добавляются в failures, если список передан.
+    Возвращает (отправлено, не отправлено).
+    """
+    if not messages:
+        return 0, 0
+
+    params = telegram_settings()
+    params.update(options)
+    results = asyncio.run(send_messages_async(messages, **params))
+
+    if failures is not None:
+        failures.extend(message for message, ok in zip(messages, results) if not ok)
+    sent = sum(results)
+    return sent, len(messages) - sent
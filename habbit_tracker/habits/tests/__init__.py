@@ -0,0 +1,5 @@
+import logging
+
+# Ожидаемые в тестах предупреждения и ошибки (медленные запросы, сбои отправки)
+# не выводятся; тесты проверяют их через assertLogs, который сам понижает уровень
+logging.getLogger('habits').setLevel(logging.CRITICAL)
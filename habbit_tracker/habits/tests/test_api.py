@@ -1,13 +1,16 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.cache import cache, caches
 from rest_framework.test import APIClient
 from rest_framework import status
-from ..models import Habit, HabitLog
+from ..models import Habit, HabitLog, Tombstone, UserDataVersion
+from ..response_cache import metrics
 import json
 
 
 class HabitAPITest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             username='testuser',
@@ -94,6 +97,220 @@ class HabitAPITest(TestCase):
         self.assertIn('current_streak', response.data)
         self.assertIn('completion_rate', response.data)
 
+    def test_statistics_values_and_window(self):
+        from django.utils import timezone
+        from datetime import timedelta
+
+        today = timezone.now().date()
+        for i in [0, 1, 3, 4, 5, 40]:
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=today - timedelta(days=i),
+                completed=True
+            )
+
+        url = f'/api/habits/{self.habit.id}/statistics/'
+        # Токен + версия данных + привычка + логи окна + общее число выполнений
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual(response.data['best_streak'], 3)
+        self.assertEqual(response.data['completion_rate'], round(5 / 30 * 100))
+        self.assertEqual(response.data['total_completed'], 6)
+
+        response = self.client.get(url, {'days': 60})
+        self.assertEqual(response.data['completion_rate'], round(6 / 60 * 100))
+
+    def test_statistics_short_window_never_exceeds_100(self):
+        from django.utils import timezone
+        from datetime import timedelta
+
+        today = timezone.now().date()
+        for i in range(2):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=today - timedelta(days=i),
+                completed=True
+            )
+
+        url = f'/api/habits/{self.habit.id}/statistics/'
+        for days in (1, 2):
+            response = self.client.get(url, {'days': days})
+            self.assertEqual(response.data['completion_rate'], 100)
+
+    def test_habit_list_logs_are_opt_in_and_bounded(self):
+        from django.utils import timezone
+        from datetime import timedelta
+
+        today = timezone.now().date()
+        for i in range(40):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=today - timedelta(days=i),
+                completed=True
+            )
+
+        response = self.client.get('/api/habits/')
+        self.assertNotIn('logs', response.data['results'][0])
+
+        response = self.client.get('/api/habits/', {'include': 'logs'})
+        logs = response.data['results'][0]['logs']
+        self.assertEqual(len(logs), 30)
+        self.assertEqual(logs[0]['date'], str(today))
+
+        response = self.client.get('/api/habits/', {
+            'include': 'logs',
+            'logs_since': str(today - timedelta(days=4)),
+            'logs_limit': 3,
+        })
+        self.assertEqual(len(response.data['results'][0]['logs']), 3)
+
+        response = self.client.get('/api/habits/', {'include': 'logs', 'logs_since': 'вчера'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_habit_list_sparse_fields(self):
+        response = self.client.get('/api/habits/', {'fields': 'id,name,current_streak'})
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'name', 'current_streak'}
+        )
+
+        # На запись ?fields= не влияет
+        response = self.client.post('/api/habits/?fields=id', {'name': 'С полями'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'С полями')
+
+    def test_habit_list_query_count_does_not_grow(self):
+        from django.utils import timezone
+
+        today = timezone.now().date()
+        for i in range(9):
+            habit = Habit.objects.create(user=self.user, name=f'Привычка {i}')
+            HabitLog.objects.create(habit=habit, date=today, completed=True)
+
+        # Токен + версия данных + COUNT пагинации + привычки с агрегатами + логи
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/habits/', {'include': 'logs'})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_logs_cursor_pagination_and_filters(self):
+        from django.utils import timezone
+        from datetime import timedelta
+
+        today = timezone.now().date()
+        other = Habit.objects.create(user=self.user, name='Другая')
+        for i in range(30):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=today - timedelta(days=i),
+                completed=(i % 3 != 0)
+            )
+            HabitLog.objects.create(habit=other, date=today - timedelta(days=i), completed=True)
+
+        seen = []
+        url = '/api/logs/?page_size=7'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(log['id'] for log in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 60)
+        self.assertEqual(len(set(seen)), 60)
+
+        response = self.client.get('/api/logs/', {
+            'habit': self.habit.id,
+            'date_after': str(today - timedelta(days=9)),
+            'date_before': str(today - timedelta(days=1)),
+            'completed': 'true',
+        })
+        dates = [log['date'] for log in response.data['results']]
+        self.assertEqual(len(dates), 6)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+        response = self.client.get('/api/logs/', {'date_after': 'позавчера'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_upsert_logs(self):
+        from django.utils import timezone
+        from datetime import timedelta
+        from ..models import DailyStats
+        from ..bitmaps import load_day_bits
+
+        today = timezone.now().date()
+        HabitLog.objects.create(habit=self.habit, date=today, completed=False, notes='старое')
+
+        entries = [
+            {'habit': self.habit.id, 'date': str(today - timedelta(days=i)), 'completed': True}
+            for i in range(10)
+        ]
+        response = self.client.post('/api/logs/bulk/', entries, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(HabitLog.objects.filter(habit=self.habit, completed=True).count(), 10)
+        self.assertEqual(HabitLog.objects.get(habit=self.habit, date=today).notes, '')
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.current_streak, 10)
+        self.assertEqual(self.habit.best_streak, 10)
+        self.assertEqual(load_day_bits(self.habit, today - timedelta(days=9), today).count_completed(), 10)
+        self.assertEqual(DailyStats.objects.get(user=self.user, date=today).completed_habits, 1)
+
+    def test_bulk_upsert_rejects_foreign_habits(self):
+        other_user = User.objects.create_user(username='other', password='otherpass123')
+        foreign = Habit.objects.create(user=other_user, name='Чужая')
+
+        response = self.client.post('/api/logs/bulk/', [
+            {'habit': self.habit.id, 'date': '2024-01-01', 'completed': True},
+            {'habit': foreign.id, 'date': '2024-01-01', 'completed': True},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(HabitLog.objects.exists())
+
+    def test_delta_sync(self):
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+
+        log = HabitLog.objects.create(habit=self.habit, date=timezone.now().date(), completed=True)
+        other = Habit.objects.create(user=self.user, name='Удаляемая')
+        other_log = HabitLog.objects.create(habit=other, date=timezone.now().date(), completed=True)
+
+        response = self.client.get('/api/sync/')
+        self.assertTrue(response.data['reset'])
+        self.assertEqual(len(response.data['habits']), 2)
+        self.assertEqual({item['id'] for item in response.data['logs']}, {log.id, other_log.id})
+
+        # Изменения через минуту после выдачи токена
+        token = response.data['token']
+        other_id = other.id
+        later = timezone.now() + timedelta(minutes=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            log.notes = 'изменено'
+            log.save()
+            other.delete()
+
+        response = self.client.get('/api/sync/', {'since': token})
+        self.assertFalse(response.data['reset'])
+        self.assertEqual([item['id'] for item in response.data['logs']], [log.id])
+        self.assertEqual([item['id'] for item in response.data['habits']], [self.habit.id])
+        self.assertEqual(response.data['deleted']['habits'], [other_id])
+        # Отметки удаленной привычки клиент удаляет вместе с ней
+        self.assertEqual(response.data['deleted']['logs'], [])
+
+        # Нечисловой токен и токены за пределами диапазона дат
+        for token in ['abc', '99999999999999999999', '9' * 400]:
+            response = self.client.get('/api/sync/', {'since': token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_delete_leaves_no_tombstones(self):
+        HabitLog.objects.create(habit=self.habit, date='2024-01-01', completed=True)
+
+        # При удалении через QuerySet в origin приходит QuerySet, а не пользователь
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertFalse(Tombstone.objects.exists())
+
     def test_get_dashboard(self):
         response = self.client.get('/api/dashboard/')
 
@@ -103,6 +320,182 @@ class HabitAPITest(TestCase):
         self.assertIn('daily_stats', response.data)
 
 
+    def test_dashboard_values(self):
+        from django.utils import timezone
+        from datetime import timedelta
+
+        today = timezone.now().date()
+        for i in range(1, 6):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=today - timedelta(days=i),
+                completed=(i != 3)
+            )
+
+        response = self.client.get('/api/dashboard/')
+        stat = response.data['stats'][0]
+
+        self.assertEqual(stat['total_logs'], 5)
+        self.assertEqual(stat['total_completed'], 4)
+        self.assertEqual(stat['current_streak'], 2)
+        self.assertEqual(stat['completion_rate'], round(4 / 30 * 100))
+        self.assertEqual(response.data['summary']['total_completed_logs'], 4)
+
+        daily = {day['date']: day['completed_habits'] for day in response.data['daily_stats']}
+        self.assertEqual(len(daily), 7)
+        self.assertEqual(daily[today - timedelta(days=1)], 1)
+        self.assertEqual(daily[today - timedelta(days=3)], 0)
+        self.assertTrue(all(day['total_habits'] == 1 for day in response.data['daily_stats']))
+
+    def test_dashboard_query_count_does_not_grow(self):
+        from django.utils import timezone
+
+        today = timezone.now().date()
+        for i in range(10):
+            habit = Habit.objects.create(user=self.user, name=f'Привычка {i}')
+            HabitLog.objects.create(habit=habit, date=today, completed=True)
+
+        # Токен + версия данных + привычки с агрегатами + статистика по дням
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/dashboard/')
+        self.assertEqual(len(response.data['stats']), 11)
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name='Кэш')
+
+    def test_repeated_reads_are_served_from_cache(self):
+        for url in ['/api/dashboard/', '/api/habits/', f'/api/habits/{self.habit.pk}/statistics/']:
+            first = self.client.get(url)
+            self.assertEqual(first['X-Cache'], 'MISS')
+
+            # Из кэша - только чтение версии данных
+            with self.assertNumQueries(1):
+                second = self.client.get(url)
+            self.assertEqual(second['X-Cache'], 'HIT')
+            self.assertEqual(second.data, first.data)
+
+        self.assertEqual(metrics.snapshot()['dashboard'], {'miss': 1, 'store': 1, 'hit': 1})
+
+    def test_writes_invalidate_cache(self):
+        self.client.get('/api/dashboard/')
+        # Версия данных увеличивается после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/habits/{self.habit.pk}/log_today/')
+
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['summary']['total_completed_logs'], 1)
+
+        self.client.get('/api/habits/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(user=self.user, name='Новая')
+        response = self.client.get('/api/habits/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_version_bumped_once_per_transaction(self):
+        version, _ = UserDataVersion.get_state(self.user.pk)
+        # Отметка сохраняет и отметку, и серии привычки
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/habits/{self.habit.pk}/log_today/')
+        self.assertEqual(UserDataVersion.get_state(self.user.pk)[0], version + 1)
+
+    def test_cache_is_per_user_and_query(self):
+        self.client.get('/api/habits/')
+        response = self.client.get('/api/habits/', {'fields': 'id'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(other)
+        response = self.client.get('/api/habits/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+    @override_settings(RESPONSE_CACHE_MAX_ENTRY_BYTES=10)
+    def test_large_responses_are_not_cached(self):
+        self.client.get('/api/dashboard/')
+        response = self.client.get('/api/dashboard/')
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(metrics.snapshot()['dashboard']['too_large'], 2)
+
+    def test_locmem_eviction_is_bounded(self):
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'response-cache-eviction',
+            'OPTIONS': {'MAX_ENTRIES': 3},
+        }}):
+            for days in range(1, 10):
+                self.client.get(f'/api/habits/{self.habit.pk}/statistics/', {'days': days})
+            self.assertLessEqual(len(caches['default']._cache), 3)
+
+    def test_file_backend(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory,
+            }}):
+                self.client.get('/api/dashboard/')
+                self.assertEqual(self.client.get('/api/dashboard/')['X-Cache'], 'HIT')
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.habit = Habit.objects.create(user=self.user, name='ETag')
+
+    def test_if_none_match_returns_304_without_work(self):
+        for url in ['/api/dashboard/', '/api/habits/', f'/api/habits/{self.habit.pk}/',
+                    f'/api/habits/{self.habit.pk}/statistics/', '/api/logs/']:
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.assertNotIn('Last-Modified', response)
+
+            # Только чтение версии данных, без сериализации и кэша
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+
+    def test_etag_changes_after_write(self):
+        etag = self.client.get('/api/dashboard/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/habits/{self.habit.pk}/log_today/')
+
+        response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get('/api/habits/')['ETag']
+        response = self.client.get('/api/habits/', {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since_is_ignored(self):
+        from django.utils.http import http_date
+        import time
+
+        # Секундный валидатор скрыл бы запись, сделанную в ту же секунду
+        self.client.get('/api/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/habits/{self.habit.pk}/log_today/')
+
+        response = self.client.get('/api/dashboard/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
 class AuthenticationTest(TestCase):
     def test_token_auth(self):
         client = APIClient()
@@ -0,0 +1,75 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from io import StringIO
+from ..models import Achievement, AchievementThreshold, Habit, HabitYearBitmap, PublicAchievementCounter, ReminderSettings
+from ..streaks import calculate_streak_state
+import json
+
+
+class BenchmarkCommandsTest(TestCase):
+    def seed(self, *args):
+        call_command('seed_benchmark', '--users=4', '--habits=3', '--years=0.5', *args, stdout=StringIO())
+
+    def test_seeded_data_is_consistent(self):
+        self.seed()
+
+        users = User.objects.filter(username__startswith='bench_')
+        self.assertEqual(users.count(), 4)
+        self.assertEqual(ReminderSettings.objects.filter(user__in=users).count(), 4)
+
+        thresholds = AchievementThreshold.get_map()
+        for habit in Habit.objects.filter(user__in=users):
+            logs = list(habit.logs.order_by('date').values_list('date', 'completed'))
+            self.assertTrue(logs)
+            # Сохраненные серии и битовые карты совпадают с пересчетом по истории
+            state = calculate_streak_state(logs)
+            self.assertEqual({field: getattr(habit, field) for field in state}, state)
+
+            bitmaps = set(HabitYearBitmap.objects.filter(habit=habit).values_list('year', 'completed', 'marked'))
+            HabitYearBitmap.rebuild_for_habit(habit)
+            self.assertEqual(
+                set(HabitYearBitmap.objects.filter(habit=habit).values_list('year', 'completed', 'marked')), bitmaps
+            )
+
+            self.assertEqual(
+                set(habit.achievements.values_list('streak_length', flat=True)),
+                {length for length in thresholds if length <= habit.best_streak}
+            )
+
+        for user in users:
+            counter = PublicAchievementCounter.objects.filter(user=user).first()
+            self.assertEqual(
+                getattr(counter, 'count', 0), Achievement.objects.filter(user=user, is_public=True).count()
+            )
+
+    def test_reseed_requires_clear(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+        self.seed('--clear', '--seed=1')
+        self.assertEqual(User.objects.filter(username__startswith='bench_').count(), 4)
+
+    def test_benchmark_report(self):
+        self.seed()
+        out = StringIO()
+        call_command(
+            'run_benchmark', '--iterations=3', '--warmup=0', '--only', 'api_habits', 'public_achievements',
+            'send_daily_reminders', stdout=out, stderr=StringIO()
+        )
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['dataset'], {'users': 4, 'habits': 12})
+        self.assertEqual(set(report['results']), {'api_habits', 'public_achievements', 'send_daily_reminders'})
+        for result in report['results'].values():
+            self.assertEqual(result['calls'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_per_call'], 0)
+        self.assertIn('sent_per_call', report['results']['send_daily_reminders'])
+
+    def test_benchmark_requires_data(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmark', stdout=StringIO(), stderr=StringIO())
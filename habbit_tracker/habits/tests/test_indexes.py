@@ -0,0 +1,89 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from datetime import date
+from ..models import Achievement, Habit, HabitLog
+
+
+class QueryPlanTest(TestCase):
+    """
+    Частые запросы должны идти по индексу, а не полным просмотром таблицы.
+
+    Таблицы в тестах маленькие, поэтому на PostgreSQL последовательное
+    чтение отключается: проверяется, что подходящий индекс вообще есть.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='testuser', password='testpass123')
+        cls.habit = Habit.objects.create(user=cls.user, name='Тестовая привычка')
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def unique_index(self, model, name):
+        """Имя индекса UniqueConstraint в плане: SQLite создает его сам"""
+        if connection.vendor == 'sqlite':
+            return f'sqlite_autoindex_{model._meta.db_table}'
+        return name
+
+    def assertUsesIndex(self, queryset, *names):
+        plan = self.explain(queryset)
+        table = queryset.model._meta.db_table
+        self.assertTrue(any(name in plan for name in names), f'Нет индекса из {names}:\n{plan}')
+        self.assertNotRegex(plan, self.full_scan(table))
+
+    def full_scan(self, table):
+        # Обход по индексу ради сортировки (SCAN ... USING INDEX) допустим
+        return rf'SCAN {table}\b(?! USING)|Seq Scan on {table}\b'
+
+    def test_habit_logs_by_completed_and_date(self):
+        self.assertUsesIndex(
+            HabitLog.objects.filter(habit=self.habit, completed=True, date__gte=date(2024, 1, 1)),
+            'habitlog_habit_completed_date',
+            self.unique_index(HabitLog, 'habitlog_unique_habit_date')
+        )
+
+    def test_habit_log_history(self):
+        self.assertUsesIndex(
+            HabitLog.objects.filter(habit=self.habit).order_by('date').values_list('date', 'completed'),
+            self.unique_index(HabitLog, 'habitlog_unique_habit_date'),
+            'habitlog_habit_completed_date'
+        )
+
+    def test_user_logs_by_date(self):
+        queryset = HabitLog.objects.filter(habit__user=self.user, date__gte=date(2024, 1, 1))
+        self.assertUsesIndex(
+            queryset,
+            self.unique_index(HabitLog, 'habitlog_unique_habit_date'),
+            'habitlog_habit_completed_date',
+            'habitlog_date_id'
+        )
+        self.assertNotRegex(self.explain(queryset), self.full_scan(Habit._meta.db_table))
+
+    def test_active_habits(self):
+        self.assertUsesIndex(Habit.objects.filter(user=self.user, is_active=True), 'habit_user_active')
+
+    def test_habit_list_ordering(self):
+        self.assertUsesIndex(Habit.objects.filter(user=self.user).order_by('-created_at'), 'habit_user_created_at')
+
+    def test_public_feed(self):
+        self.assertUsesIndex(
+            Achievement.objects.filter(is_public=True).order_by('-achieved_at')[:10],
+            'achievement_public_recent'
+        )
+
+    def test_achievement_lookup(self):
+        self.assertUsesIndex(
+            Achievement.objects.filter(user=self.user, habit=self.habit, streak_length=7),
+            self.unique_index(Achievement, 'achievement_unique_habit_streak')
+        )
+
+    def test_best_user_achievement(self):
+        self.assertUsesIndex(
+            Achievement.objects.filter(user=self.user).order_by('-streak_length')[:1],
+            'achievement_user_streak'
+        )
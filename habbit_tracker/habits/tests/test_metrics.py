@@ -0,0 +1,119 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from ..metrics import MetricsRegistry, collect, registry, render
+from ..models import Habit, ReminderSettings
+from ..tasks import send_daily_reminders
+import re
+import subprocess
+import tempfile
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=self.directory.name, METRICS_TOKEN='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        registry.reset()
+        cache.clear()
+
+        self.user = User.objects.create_user(username='testuser', password='testpass123', email='user@example.com')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        Habit.objects.create(user=self.user, name='Бег')
+
+    def scrape(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def sample(self, text, series):
+        match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.MULTILINE)
+        return float(match.group(1)) if match else None
+
+    def test_processes_are_aggregated(self):
+        # Два "процесса" с общим каталогом
+        workers = [MetricsRegistry(), MetricsRegistry()]
+        for count, worker in enumerate(workers, start=1):
+            worker.inc('habits_reminder_sent_total', {'channel': 'email'}, count)
+            worker.observe('habits_http_request_duration_seconds', 0.02 * count, {'route': 'index'})
+            worker.set('habits_reminder_queue_lag_seconds', 10 * count)
+            worker.flush(force=True)
+
+        text = render(*collect(self.directory.name))
+        self.assertEqual(self.sample(text, 'habits_reminder_sent_total{channel="email"}'), 3)
+        self.assertEqual(self.sample(text, 'habits_reminder_queue_lag_seconds'), 20)
+        self.assertEqual(
+            self.sample(text, 'habits_http_request_duration_seconds_bucket{route="index",le="0.025"}'), 1
+        )
+        self.assertEqual(
+            self.sample(text, 'habits_http_request_duration_seconds_bucket{route="index",le="+Inf"}'), 2
+        )
+        self.assertEqual(self.sample(text, 'habits_http_request_duration_seconds_count{route="index"}'), 2)
+        self.assertIn('# TYPE habits_http_request_duration_seconds histogram', text)
+
+    def test_gauges_of_dead_processes_are_skipped(self):
+        live, dead = MetricsRegistry(), MetricsRegistry()
+        # PID завершившегося процесса: дочерний процесс уже дождались
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead.filename = f'{process.pid}-dead.json'
+
+        for count, worker in enumerate([live, dead], start=1):
+            worker.inc('habits_reminder_sent_total', {'channel': 'email'}, count)
+            worker.set('habits_reminder_queue_lag_seconds', 10 * count)
+            worker.flush(force=True)
+
+        text = render(*collect(self.directory.name))
+        # Счетчики умершего процесса сохраняются, его датчики - нет
+        self.assertEqual(self.sample(text, 'habits_reminder_sent_total{channel="email"}'), 3)
+        self.assertEqual(self.sample(text, 'habits_reminder_queue_lag_seconds'), 10)
+
+    def test_request_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.get('/api/habits/')
+        self.client.get('/api/habits/')
+
+        text = self.scrape()
+        self.assertEqual(
+            self.sample(text, 'habits_http_request_duration_seconds_count{method="GET",route="index",status="200"}'),
+            2
+        )
+        self.assertGreater(self.sample(text, 'habits_http_db_queries_total{route="index"}'), 0)
+        # Второй запрос к списку привычек отдан из кэша ответов
+        self.assertEqual(self.sample(text, 'habits_response_cache_hit_ratio{endpoint="habits"}'), 0.5)
+
+    def test_reminder_metrics(self):
+        now = timezone.make_aware(datetime(2024, 5, 10, 9, 5))
+        reminder = self.user.reminder_settings
+        reminder.reminder_time = time(9, 0)
+        reminder.save()
+        ReminderSettings.objects.filter(pk=reminder.pk).update(next_fire_at=now - timedelta(minutes=5))
+
+        self.assertEqual(send_daily_reminders(now=now), 1)
+
+        text = self.scrape()
+        self.assertEqual(self.sample(text, 'habits_reminder_users_scanned_total'), 1)
+        self.assertEqual(self.sample(text, 'habits_reminder_sent_total{channel="email"}'), 1)
+        self.assertEqual(self.sample(text, 'habits_reminder_failed_total{channel="email"}'), 0)
+        self.assertEqual(self.sample(text, 'habits_reminder_queue_lag_seconds'), 300)
+        self.assertEqual(self.sample(text, 'habits_reminder_last_run_timestamp_seconds'), now.timestamp())
+        self.assertEqual(self.sample(text, 'habits_reminder_run_duration_seconds_count'), 1)
+
+    def test_access(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+        with override_settings(METRICS_TOKEN='secret'):
+            self.client.logout()
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
@@ -1,8 +1,16 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
-from ..models import Habit, HabitLog
+from unittest import mock
+from ..models import (
+    Achievement, AchievementThreshold, DailyStats, Habit, HabitLog, HabitYearBitmap, PublicAchievementCounter
+)
+from .. import achievements
+from ..bitmaps import load_day_bits, iter_days
+from ..streaks import calculate_streak_state
 
 
 class HabitModelTest(TestCase):
@@ -93,3 +101,459 @@ class HabitLogModelTest(TestCase):
                 date=self.log.date,
                 completed=False
             )
+
+
+class HabitStreakStateTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='streakuser',
+            password='testpass123'
+        )
+        self.habit = Habit.objects.create(user=self.user, name='Серии')
+        self.today = timezone.now().date()
+
+    def assertStateMatchesHistory(self):
+        habit = Habit.objects.get(pk=self.habit.pk)
+        expected = calculate_streak_state(
+            habit.logs.order_by('date').values_list('date', 'completed')
+        )
+        actual = {field: getattr(habit, field) for field in Habit.STREAK_FIELDS}
+        self.assertEqual(actual, expected)
+
+    def test_state_updated_on_create(self):
+        for i in range(5, 0, -1):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=self.today - timedelta(days=i),
+                completed=True
+            )
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.current_streak, 5)
+        self.assertEqual(self.habit.best_streak, 5)
+        self.assertEqual(self.habit.last_completed_date, self.today - timedelta(days=1))
+        self.assertIsNone(self.habit.last_missed_date)
+
+    def test_toggle_today(self):
+        for i in range(3, 0, -1):
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=self.today - timedelta(days=i),
+                completed=True
+            )
+        log = HabitLog.objects.create(habit=self.habit, date=self.today, completed=False)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.current_streak, 0)
+        self.assertEqual(self.habit.best_streak, 3)
+
+        log.completed = True
+        log.save()
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.current_streak, 4)
+        self.assertEqual(self.habit.best_streak, 4)
+        self.assertStateMatchesHistory()
+
+    def test_delete_log(self):
+        logs = [
+            HabitLog.objects.create(
+                habit=self.habit,
+                date=self.today - timedelta(days=i),
+                completed=True
+            )
+            for i in range(4, -1, -1)
+        ]
+        logs[-1].delete()
+        self.assertStateMatchesHistory()
+
+        HabitLog.objects.filter(habit=self.habit, date__lt=self.today - timedelta(days=2)).delete()
+        self.assertStateMatchesHistory()
+
+    def test_untoggle_and_delete_without_rebuild(self):
+        for i in range(6, 3, -1):
+            HabitLog.objects.create(habit=self.habit, date=self.today - timedelta(days=i), completed=True)
+        HabitLog.objects.create(habit=self.habit, date=self.today - timedelta(days=3), completed=False)
+        logs = [
+            HabitLog.objects.create(habit=self.habit, date=self.today - timedelta(days=i), completed=True)
+            for i in range(2, -1, -1)
+        ]
+
+        # Текущая серия равна лучшей: снятие и удаление отметок не читают всю историю
+        with mock.patch.object(Habit, 'rebuild_streak_state') as rebuild:
+            logs[-1].completed = False
+            logs[-1].save()
+            self.assertStateMatchesHistory()
+            logs[-1].completed = True
+            logs[-1].save()
+            self.assertStateMatchesHistory()
+            logs[0].delete()
+            self.assertStateMatchesHistory()
+            logs[-1].delete()
+            self.assertStateMatchesHistory()
+        rebuild.assert_not_called()
+
+    def test_random_edits_match_full_rebuild(self):
+        import random
+        rng = random.Random(42)
+
+        for _ in range(150):
+            date = self.today - timedelta(days=rng.randrange(20))
+            log = HabitLog.objects.filter(habit=self.habit, date=date).first()
+            action = rng.random()
+            if log is None:
+                HabitLog.objects.create(habit=self.habit, date=date, completed=action < 0.7)
+            elif action < 0.2:
+                log.delete()
+            else:
+                log.completed = not log.completed
+                log.save()
+            self.assertStateMatchesHistory()
+
+    def test_rebuild_streaks_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        HabitLog.objects.create(habit=self.habit, date=self.today, completed=True)
+        Habit.objects.filter(pk=self.habit.pk).update(current_streak=42, best_streak=42)
+
+        call_command('rebuild_streaks', stdout=StringIO())
+        self.assertStateMatchesHistory()
+
+
+class HabitYearBitmapTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='bitmapuser',
+            password='testpass123'
+        )
+        self.habit = Habit.objects.create(user=self.user, name='Биты')
+
+    def assertBitsMatchLogs(self, start_date, end_date):
+        day_bits = load_day_bits(self.habit, start_date, end_date)
+        logs = dict(self.habit.logs.values_list('date', 'completed'))
+        for date, marked, completed in iter_days(day_bits):
+            self.assertEqual(marked, date in logs, date)
+            self.assertEqual(completed, logs.get(date, False), date)
+
+    def test_range_across_year_boundary(self):
+        from datetime import date
+
+        for day, completed in [(29, True), (30, True), (31, False)]:
+            HabitLog.objects.create(habit=self.habit, date=date(2023, 12, day), completed=completed)
+        for day in range(1, 5):
+            HabitLog.objects.create(habit=self.habit, date=date(2024, 1, day), completed=True)
+        HabitLog.objects.create(habit=self.habit, date=date(2024, 12, 31), completed=True)
+
+        self.assertEqual(self.habit.year_bitmaps.count(), 2)
+        self.assertBitsMatchLogs(date(2023, 12, 1), date(2024, 12, 31))
+
+        day_bits = load_day_bits(self.habit, date(2023, 12, 29), date(2024, 1, 4))
+        self.assertEqual(day_bits.count_completed(), 6)
+        self.assertEqual(day_bits.longest_run(), 4)
+        self.assertEqual(day_bits.trailing_run(), 4)
+
+    def test_bitmaps_follow_edits_and_rebuild(self):
+        import random
+        rng = random.Random(7)
+        today = timezone.now().date()
+
+        for _ in range(80):
+            date = today - timedelta(days=rng.randrange(400))
+            log = HabitLog.objects.filter(habit=self.habit, date=date).first()
+            if log is None:
+                HabitLog.objects.create(habit=self.habit, date=date, completed=rng.random() < 0.7)
+            elif rng.random() < 0.3:
+                log.delete()
+            else:
+                log.completed = not log.completed
+                log.save()
+
+        self.assertBitsMatchLogs(today - timedelta(days=400), today)
+
+        HabitYearBitmap.objects.filter(habit=self.habit).delete()
+        HabitYearBitmap.rebuild_for_habit(self.habit)
+        self.assertBitsMatchLogs(today - timedelta(days=400), today)
+
+    def test_notes_edit_skips_bitmap(self):
+        log = HabitLog.objects.create(habit=self.habit, date=timezone.now().date(), completed=True)
+        log.notes = 'заметка'
+        with mock.patch.object(HabitYearBitmap, 'set_day') as set_day:
+            log.save()
+        set_day.assert_not_called()
+
+
+class DailyStatsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='statsuser',
+            password='testpass123'
+        )
+        self.habits = [
+            Habit.objects.create(user=self.user, name=f'Сводка {i}')
+            for i in range(3)
+        ]
+        self.today = timezone.now().date()
+
+    def completed_by_date(self):
+        return dict(DailyStats.objects.filter(user=self.user).values_list('date', 'completed_habits'))
+
+    def expected_by_date(self):
+        from django.db.models import Count, Q
+        rows = HabitLog.objects.filter(habit__user=self.user).order_by().values('date').annotate(
+            completed=Count('id', filter=Q(completed=True))
+        ).values_list('date', 'completed')
+        return {date: completed for date, completed in rows}
+
+    def test_stats_follow_log_changes(self):
+        log = HabitLog.objects.create(habit=self.habits[0], date=self.today, completed=True)
+        HabitLog.objects.create(habit=self.habits[1], date=self.today, completed=True)
+        HabitLog.objects.create(habit=self.habits[2], date=self.today, completed=False)
+
+        stats = DailyStats.objects.get(user=self.user, date=self.today)
+        self.assertEqual(stats.completed_habits, 2)
+
+        log.completed = False
+        log.save()
+        HabitLog.objects.filter(habit=self.habits[1]).delete()
+        self.assertEqual(self.completed_by_date()[self.today], 0)
+
+    def test_habit_delete_updates_stats(self):
+        HabitLog.objects.create(habit=self.habits[0], date=self.today, completed=True)
+        HabitLog.objects.create(habit=self.habits[1], date=self.today, completed=True)
+        HabitLog.objects.create(habit=self.habits[1], date=self.today - timedelta(days=1), completed=True)
+        HabitLog.objects.create(habit=self.habits[2], date=self.today, completed=False)
+
+        self.habits[1].delete()
+        self.assertEqual(self.completed_by_date(), {self.today: 1, self.today - timedelta(days=1): 0})
+
+        Habit.objects.filter(pk=self.habits[0].pk).delete()
+        self.assertEqual(self.completed_by_date()[self.today], 0)
+
+    def test_save_with_unknown_state_refreshes_day(self):
+        HabitLog.objects.create(habit=self.habits[0], date=self.today, completed=True)
+
+        # Отметка загружена без поля completed: исходный статус неизвестен
+        log = HabitLog.objects.defer('completed').get(habit=self.habits[0])
+        log.completed = False
+        log.save()
+        self.assertEqual(self.completed_by_date()[self.today], 0)
+
+    def test_rebuild_daily_stats_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        for i in range(10):
+            for habit in self.habits:
+                HabitLog.objects.create(
+                    habit=habit,
+                    date=self.today - timedelta(days=i),
+                    completed=(i + habit.pk) % 3 != 0
+                )
+        self.assertEqual(self.completed_by_date(), self.expected_by_date())
+
+        DailyStats.objects.all().delete()
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(self.completed_by_date(), self.expected_by_date())
+
+
+@override_settings(ACHIEVEMENTS_ASYNC=False)
+class AchievementTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.habit = Habit.objects.create(user=self.user, name='Бег')
+        self.today = timezone.now().date()
+
+    def log_days(self, count):
+        for offset in range(count, 0, -1):
+            HabitLog.objects.create(habit=self.habit, date=self.today - timedelta(days=offset - 1), completed=True)
+
+    def test_achievement_created_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log_days(7)
+            # До коммита проверка не выполняется
+            self.assertFalse(Achievement.objects.exists())
+
+        achievement = Achievement.objects.get()
+        self.assertEqual((achievement.habit, achievement.streak_length), (self.habit, 7))
+        self.assertEqual(achievement.title, 'Первая неделя!')
+
+    def test_saves_are_coalesced(self):
+        other = Habit.objects.create(user=self.user, name='Чтение')
+
+        with mock.patch.object(achievements, 'evaluate_achievements') as evaluate:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    self.log_days(3)
+                    HabitLog.objects.create(habit=other, date=self.today, completed=True)
+
+        evaluate.assert_called_once_with({self.habit.pk, other.pk})
+
+    def test_duplicates_are_ignored(self):
+        self.log_days(7)
+        self.habit.refresh_from_db()
+
+        Achievement.check_and_create_achievements(self.habit)
+        Achievement.check_and_create_achievements(self.habit)
+        self.assertEqual(Achievement.objects.filter(habit=self.habit).count(), 1)
+
+    def test_thresholds_are_cached(self):
+        self.log_days(3)
+        self.habit.refresh_from_db()
+        AchievementThreshold.get_map()
+
+        # Пороги берутся из кэша, а для серии 3 вставлять нечего
+        with self.assertNumQueries(0):
+            Achievement.check_and_create_achievements(self.habit)
+        self.assertFalse(Achievement.objects.exists())
+
+        # Новый порог сбрасывает кэш
+        AchievementThreshold.objects.create(streak_length=3, title='Три дня')
+        Achievement.check_and_create_achievements(self.habit)
+        self.assertEqual(Achievement.objects.get().title, 'Три дня')
+
+    @override_settings(ACHIEVEMENTS_ASYNC=True)
+    def test_async_evaluation_uses_worker(self):
+        with mock.patch.object(achievements.worker, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                HabitLog.objects.create(habit=self.habit, date=self.today, completed=True)
+
+        submit.assert_called_once_with({self.habit.pk})
+        self.assertFalse(Achievement.objects.exists())
+
+    @override_settings(ACHIEVEMENTS_ASYNC=None)
+    def test_async_by_default_on_postgresql(self):
+        with mock.patch.object(achievements.connection, 'vendor', 'sqlite'):
+            self.assertFalse(achievements.achievements_async())
+        with mock.patch.object(achievements.connection, 'vendor', 'postgresql'):
+            self.assertTrue(achievements.achievements_async())
+
+    def test_worker_drains_queue_on_stop(self):
+        worker = achievements.AchievementWorker()
+        with mock.patch.object(achievements, 'evaluate_achievements') as evaluate:
+            worker.submit({self.habit.pk})
+            worker.stop()
+
+        evaluate.assert_called_once_with({self.habit.pk})
+        self.assertFalse(worker.thread.is_alive())
+
+    def test_backfill_from_history(self):
+        from django.core.management import call_command
+        from io import StringIO
+        import tempfile
+
+        # История импортирована без сохранения по одной: достижений нет
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=self.habit, date=self.today - timedelta(days=offset), completed=offset != 20)
+            for offset in range(40)
+        ])
+        other = Habit.objects.create(user=self.user, name='Чтение')
+        HabitLog.objects.bulk_create([
+            HabitLog(habit=other, date=self.today - timedelta(days=offset), completed=True)
+            for offset in range(10)
+        ])
+        self.assertFalse(Achievement.objects.exists())
+
+        call_command('backfill_achievements', '--workers=1', '--dry-run', stdout=StringIO())
+        self.assertFalse(Achievement.objects.exists())
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = f'{directory}/checkpoint'
+            out = StringIO()
+            call_command(
+                'backfill_achievements', '--workers=1', '--chunk-size=1', f'--checkpoint={checkpoint}', stdout=out
+            )
+            with open(checkpoint) as f:
+                self.assertEqual(int(f.read()), other.pk)
+
+            # Повторный запуск с контрольной точки ничего не делает
+            out = StringIO()
+            call_command(
+                'backfill_achievements', '--workers=1', f'--checkpoint={checkpoint}', '--resume', stdout=out
+            )
+            self.assertIn('Создано достижений: 0', out.getvalue())
+
+        # Лучшая серия первой привычки - 20 дней, второй - 10
+        self.assertEqual(
+            sorted(Achievement.objects.values_list('habit_id', 'streak_length')),
+            [(self.habit.pk, 7), (self.habit.pk, 14), (other.pk, 7)]
+        )
+
+
+class PublicAchievementCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [User.objects.create_user(username=f'user{i}', password='testpass123') for i in range(3)]
+        self.habits = [Habit.objects.create(user=user, name='Бег') for user in self.users]
+
+    def create(self, habit, streak_length, is_public=True):
+        return Achievement.objects.create(
+            user=habit.user, habit=habit, title='Серия', description='', streak_length=streak_length,
+            is_public=is_public
+        )
+
+    def counts(self):
+        return {
+            user.pk: getattr(PublicAchievementCounter.objects.filter(user=user).first(), 'count', 0)
+            for user in self.users
+        }
+
+    def expected_counts(self):
+        return {user.pk: user.achievements.filter(is_public=True).count() for user in self.users}
+
+    def test_counters_follow_changes(self):
+        first = self.create(self.habits[0], 7)
+        self.create(self.habits[0], 14)
+        hidden = self.create(self.habits[1], 7, is_public=False)
+        self.assertEqual(self.counts(), self.expected_counts())
+
+        # Публикация и скрытие через share_achievement сохраняют объект целиком
+        first = Achievement.objects.get(pk=first.pk)
+        first.is_public = False
+        first.save()
+        hidden = Achievement.objects.get(pk=hidden.pk)
+        hidden.is_public = True
+        hidden.save()
+        self.assertEqual(self.counts(), self.expected_counts())
+
+        Achievement.objects.filter(habit=self.habits[0]).delete()
+        self.habits[1].delete()
+        self.assertEqual(self.counts(), self.expected_counts())
+
+    def test_bulk_created_achievements_are_counted(self):
+        for habit in self.habits[:2]:
+            habit.current_streak = 7
+        Achievement.create_for_habits(self.habits[:2])
+
+        self.assertEqual(self.counts(), self.expected_counts())
+        self.assertEqual(PublicAchievementCounter.total(), 2)
+
+    def test_total_is_cached(self):
+        self.create(self.habits[0], 7)
+        self.assertEqual(PublicAchievementCounter.total(), 1)
+
+        # Повторные просмотры ленты не суммируют счетчики
+        self.create(self.habits[1], 7)
+        with self.assertNumQueries(0):
+            self.assertEqual(PublicAchievementCounter.total(), 1)
+
+        cache.delete(PublicAchievementCounter.TOTAL_CACHE_KEY)
+        self.assertEqual(PublicAchievementCounter.total(), 2)
+
+    def test_user_delete(self):
+        self.create(self.habits[0], 7)
+        # При удалении через QuerySet в origin приходит QuerySet, а не пользователь
+        User.objects.filter(pk=self.users[0].pk).delete()
+        self.assertFalse(PublicAchievementCounter.objects.exists())
+
+    def test_top_users(self):
+        for i, habit in enumerate(self.habits):
+            for length in range(i + 1):
+                self.create(habit, length + 1)
+
+        # Топ читается одним запросом к счетчикам
+        with self.assertNumQueries(1):
+            top = list(PublicAchievementCounter.top(2))
+        self.assertEqual(top, [
+            {'user__username': 'user2', 'count': 3},
+            {'user__username': 'user1', 'count': 2},
+        ])
@@ -0,0 +1,70 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from ..models import Habit
+from ..profiling import QueryProfile
+import json
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        Habit.objects.create(user=self.user, name='Бег')
+        Habit.objects.create(user=self.staff, name='Бег')
+
+    def test_server_timing_only_for_staff(self):
+        self.client.force_login(self.user)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('index')))
+
+        self.client.force_login(self.staff)
+        header = self.client.get(reverse('index'))['Server-Timing']
+        self.assertRegex(header, r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(DEBUG=True)
+    def test_server_timing_in_debug(self):
+        self.client.force_login(self.user)
+        self.assertIn('Server-Timing', self.client.get(reverse('index')))
+
+    def test_api_token_staff(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.staff).key)
+        self.assertIn('Server-Timing', client.get('/api/habits/'))
+
+    @override_settings(PROFILING_SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        self.client.force_login(self.user)
+        with self.assertLogs('habits.profiling', 'WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'slow_request')
+        self.assertEqual(record['view'], 'dashboard')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(record['db_ms'], record['total_ms'])
+
+    def test_fast_requests_are_not_logged(self):
+        self.client.force_login(self.user)
+        with self.assertNoLogs('habits.profiling', 'WARNING'):
+            self.client.get(reverse('index'))
+
+    @override_settings(PROFILING_ENABLED=False, DEBUG=True)
+    def test_disabled(self):
+        self.client.force_login(self.user)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('index')))
+
+    def test_repeated_queries(self):
+        profile = QueryProfile()
+        with connection.execute_wrapper(profile):
+            for habit in Habit.objects.all():
+                habit.logs.count()
+
+        self.assertEqual(profile.count, 3)
+        self.assertEqual(profile.duplicates, 1)
+        [repeated] = profile.top_repeated(5)
+        self.assertEqual(repeated['count'], 2)
+        self.assertIn('habits_habitlog', repeated['sql'])
@@ -0,0 +1,215 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from ..models import (
+    Achievement, DailyStats, Habit, HabitLog, HabitYearBitmap, PublicAchievementCounter
+)
+import sysconfig
+import traceback
+
+APP_DIR = Path(__file__).resolve().parent.parent
+TESTS_DIR = Path(__file__).resolve().parent
+STDLIB_DIR = Path(sysconfig.get_paths()['stdlib']).resolve()
+
+# Размеры данных: число привычек пользователя и дней истории у каждой
+HABIT_COUNTS = [1, 10, 100]
+HISTORY_DAYS = 120
+
+
+class QueryLog:
+    """
+    Записывает запросы к БД вместе с местом вызова в коде приложения.
+
+    Место вызова - ближайший к запросу кадр стека из habits вне тестов;
+    если такого нет (сессии, аутентификация DRF), берется ближайший кадр
+    вне ORM и стандартной библиотеки.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self.wrapper = connection.execute_wrapper(self)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.wrapper.__exit__(*exc)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, self.call_site()))
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def call_site():
+        frames = traceback.extract_stack()[:-2]
+        for frame in reversed(frames):
+            path = Path(frame.filename)
+            if path.is_relative_to(APP_DIR) and not path.is_relative_to(TESTS_DIR):
+                return f'{path.relative_to(APP_DIR.parent)}:{frame.lineno} in {frame.name}'
+        for frame in reversed(frames):
+            path = Path(frame.filename)
+            if '/django/db/' not in frame.filename and not path.is_relative_to(STDLIB_DIR):
+                return f'{frame.filename}:{frame.lineno} in {frame.name}'
+        return 'неизвестно'
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        """Запросы, сгруппированные по месту вызова, самые частые сверху"""
+        groups = defaultdict(list)
+        for sql, site in self.queries:
+            groups[site].append(sql)
+
+        lines = []
+        for site, queries in sorted(groups.items(), key=lambda item: -len(item[1])):
+            lines.append(f'{len(queries)} x {site}')
+            for sql in dict.fromkeys(queries):
+                lines.append(f'    {sql[:300]}')
+        return '\n'.join(lines)
+
+
+# Бюджеты включают синхронную проверку достижений при любой БД
+@override_settings(ACHIEVEMENTS_ASYNC=False)
+class QueryBudgetTest(TestCase):
+    """
+    Число запросов каждого эндпоинта не зависит от объема данных.
+
+    Эндпоинт вызывается для пользователей с 1, 10 и 100 привычками
+    и длинной историей отметок; число запросов должно укладываться
+    в бюджет и совпадать для всех размеров. Кэш ответов очищается
+    перед каждым вызовом, поэтому меряется холодный запрос.
+    """
+
+    # (название, метод, URL от данных пользователя, тело запроса, бюджет).
+    # Бюджет включает два запроса сессии и пользователя
+    ENDPOINTS = [
+        # HTML
+        ('index', 'get', lambda data: reverse('index'), None, 4),
+        ('create_habit', 'get', lambda data: reverse('create_habit'), None, 2),
+        ('log_habit', 'get', lambda data: reverse('log_habit', args=[data['habit'].pk]), None, 6),
+        ('calendar', 'get', lambda data: reverse('calendar', args=[data['habit'].pk]), None, 7),
+        ('statistics', 'get', lambda data: reverse('statistics', args=[data['habit'].pk]), None, 5),
+        ('dashboard', 'get', lambda data: reverse('dashboard'), None, 3),
+        # GET не проверяется: шаблон ссылается на несуществующий URL test_reminder
+        (
+            'reminder_settings', 'post', lambda data: reverse('reminder_settings'),
+            {'enabled': 'on', 'reminder_time': '09:00', 'timezone': 'Europe/Moscow'}, 4
+        ),
+        ('achievements_list', 'get', lambda data: reverse('achievements_list'), None, 6),
+        ('public_achievements', 'get', lambda data: reverse('public_achievements'), None, 5),
+        # Для GET share_achievement нет шаблона
+        (
+            'share_achievement', 'post',
+            lambda data: reverse('share_achievement', args=[data['achievement'].pk]), {'is_public': 'on'}, 4
+        ),
+        # API
+        ('api_habit_list', 'get', lambda data: reverse('habit-list'), None, 5),
+        ('api_habit_detail', 'get', lambda data: reverse('habit-detail', args=[data['habit'].pk]), None, 4),
+        ('api_statistics', 'get', lambda data: reverse('habit-statistics', args=[data['habit'].pk]), None, 6),
+        # Первая отметка за день: сама отметка в точке сохранения get_or_create (4),
+        # серии (2), битовая карта (2) и создание сводки за день (4)
+        ('api_log_today', 'post', lambda data: reverse('habit-log-today', args=[data['habit'].pk]), {}, 15),
+        ('api_log_list', 'get', lambda data: reverse('log-list'), None, 4),
+        ('api_log_detail', 'get', lambda data: reverse('log-detail', args=[data['log'].pk]), None, 4),
+        (
+            'api_log_bulk', 'post', lambda data: reverse('log-bulk'),
+            lambda data: [
+                {'habit': data['habit'].pk, 'date': str(data['today'] - timedelta(days=day)), 'completed': True}
+                for day in range(5)
+            ],
+            14
+        ),
+        ('api_dashboard', 'get', lambda data: reverse('api_dashboard'), None, 5),
+        ('api_sync', 'get', lambda data: reverse('api_sync'), None, 5),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.now().date()
+        cls.users = {count: cls.seed_user(count) for count in HABIT_COUNTS}
+
+    @classmethod
+    def seed_user(cls, habit_count):
+        user = User.objects.create_user(username=f'user{habit_count}', password='testpass123')
+        habits = Habit.objects.bulk_create(
+            Habit(user=user, name=f'Привычка {i}') for i in range(habit_count)
+        )
+        HabitLog.objects.bulk_create(
+            (
+                HabitLog(habit=habit, date=cls.today - timedelta(days=day), completed=day % 3 != 2)
+                for habit in habits
+                for day in range(1, HISTORY_DAYS + 1)
+            ),
+            batch_size=1000
+        )
+        for habit in habits:
+            habit.rebuild_streak_state()
+            HabitYearBitmap.rebuild_for_habit(habit)
+        DailyStats.rebuild_for_user(user)
+
+        Achievement.objects.bulk_create(
+            Achievement.for_streak(habit, length, f'{length} дней')
+            for habit in habits
+            for length in (3, 7)
+        )
+        PublicAchievementCounter.refresh_users([user.pk])
+
+        habit = habits[0]
+        return {
+            'user': user,
+            'habit': habit,
+            'log': habit.logs.first(),
+            'achievement': Achievement.objects.filter(habit=habit).first(),
+            'today': cls.today,
+        }
+
+    def request(self, method, url, body):
+        if method == 'get':
+            return self.client.get(url)
+        if 'api' in url:
+            return self.client.post(url, body, content_type='application/json')
+        return self.client.post(url, body)
+
+    def measure(self, data, method, url, body):
+        self.client.force_login(data['user'])
+        cache.clear()
+        with QueryLog() as queries:
+            response = self.request(method, url(data), body(data) if callable(body) else body)
+        self.assertLess(response.status_code, 400, f'{url(data)}: {response.status_code}')
+        return queries
+
+    def test_endpoints_within_budget(self):
+        for name, method, url, body, budget in self.ENDPOINTS:
+            with self.subTest(endpoint=name):
+                counts = {}
+                for habit_count, data in self.users.items():
+                    queries = self.measure(data, method, url, body)
+                    counts[habit_count] = len(queries)
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        f'{name}: {len(queries)} запросов при бюджете {budget} '
+                        f'({habit_count} привычек)\n{queries.report()}'
+                    )
+                self.assertEqual(
+                    len(set(counts.values())), 1,
+                    f'{name}: число запросов растет с объемом данных {counts}\n{queries.report()}'
+                )
+
+    def test_report_groups_queries_by_call_site(self):
+        data = self.users[10]
+        self.client.force_login(data['user'])
+        with QueryLog() as queries:
+            for habit in Habit.objects.filter(user=data['user']):
+                habit.logs.count()
+
+        report = queries.report()
+        self.assertTrue(report.startswith('10 x '), report)
+        self.assertEqual(report.count(' x '), 2)
@@ -0,0 +1,255 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from unittest import mock
+from ..models import Habit, HabitLog, ReminderDelivery, ReminderSettings
+from ..mailer import deliver_messages, send_batch
+from ..sharding import ShardCoordinator
+from ..tasks import run_reminder_shards, send_daily_reminders
+from .. import tasks
+
+
+class SendDailyRemindersTest(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2024, 5, 10, 9, 0, 20))
+        self.users = []
+        for i, reminder_time in enumerate([time(9, 0), time(9, 0), time(9, 1), time(8, 59)]):
+            user = User.objects.create_user(
+                username=f'user{i}',
+                password='testpass123',
+                email=f'user{i}@example.com'
+            )
+            user.reminder_settings.reminder_time = reminder_time
+            user.reminder_settings.save()
+            Habit.objects.create(user=user, name=f'Привычка {i}')
+            self.users.append(user)
+        self.schedule(self.now - timedelta(minutes=1))
+
+    def schedule(self, now):
+        """Пересчитывает next_fire_at так, будто настройки сохранены в момент now"""
+        reminders = list(ReminderSettings.objects.all())
+        for reminder in reminders:
+            reminder.next_fire_at = reminder.compute_next_fire_at(now)
+        ReminderSettings.objects.bulk_update(reminders, ['next_fire_at'])
+
+    def test_only_due_users_are_reminded(self):
+        sent = send_daily_reminders(now=self.now)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['user0@example.com', 'user1@example.com']
+        )
+
+    def test_logged_habits_are_skipped(self):
+        habit = self.users[0].habits.get()
+        HabitLog.objects.create(habit=habit, date=self.now.date(), completed=True)
+
+        send_daily_reminders(now=self.now)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user1@example.com'])
+
+    def test_users_filter(self):
+        sent = send_daily_reminders(now=self.now, users=User.objects.filter(username='user1'))
+
+        self.assertEqual(sent, 1)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user1@example.com'])
+        # Напоминание остальных пользователей не перенесено
+        reminder = ReminderSettings.objects.get(user=self.users[0])
+        self.assertEqual(reminder.next_fire_at, self.now.replace(second=0))
+
+    def test_disabled_reminders_are_skipped(self):
+        settings = self.users[1].reminder_settings
+        settings.enabled = False
+        settings.save()
+
+        send_daily_reminders(now=self.now)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user0@example.com'])
+
+    def test_user_timezone(self):
+        reminder = self.users[2].reminder_settings
+        reminder.reminder_time = time(14, 0)
+        reminder.timezone = 'Asia/Yekaterinburg'
+        reminder.save()
+        self.schedule(self.now - timedelta(minutes=1))
+
+        # 14:00 в Екатеринбурге (UTC+5) - это 09:00 UTC
+        self.assertEqual(
+            ReminderSettings.objects.get(pk=reminder.pk).next_fire_at,
+            self.now.replace(second=0)
+        )
+        self.assertEqual(send_daily_reminders(now=self.now), 3)
+
+    def test_log_today_suppresses_reminder(self):
+        from rest_framework.test import APIClient
+
+        user = self.users[0]
+        reminder = user.reminder_settings
+        reminder.reminder_time = time(21, 0)
+        reminder.timezone = 'America/Bogota'
+        reminder.save()
+        # 21:00 в Боготе (UTC-5) - это 02:00 UTC следующего дня
+        self.schedule(self.now)
+        fire_at = ReminderSettings.objects.get(pk=reminder.pk).next_fire_at
+        self.assertEqual(fire_at, timezone.make_aware(datetime(2024, 5, 11, 2, 0)))
+
+        # Отметка в 19:30 по Боготе, по UTC уже 11 мая
+        client = APIClient()
+        client.force_authenticate(user)
+        habit = user.habits.get()
+        with mock.patch('django.utils.timezone.now', return_value=fire_at - timedelta(minutes=90)):
+            response = client.post(f'/api/habits/{habit.pk}/log_today/')
+        self.assertEqual(response.status_code, 200)
+
+        send_daily_reminders(now=fire_at + timedelta(seconds=20))
+        self.assertNotIn('user0@example.com', [message.to[0] for message in mail.outbox])
+
+    def test_next_fire_at_moves_to_next_day(self):
+        send_daily_reminders(now=self.now)
+
+        reminder = ReminderSettings.objects.get(user=self.users[0])
+        self.assertEqual(reminder.next_fire_at, self.now.replace(second=0) + timedelta(days=1))
+        # Повторный запуск ничего не выбирает
+        self.assertEqual(send_daily_reminders(now=self.now + timedelta(seconds=10)), 0)
+
+    def test_stale_reminders_are_skipped(self):
+        # Планировщик стоял дольше MAX_CATCH_UP: старые напоминания не досылаются
+        sent = send_daily_reminders(now=self.now + timedelta(hours=2))
+
+        self.assertEqual(sent, 0)
+        self.assertFalse(ReminderSettings.objects.filter(next_fire_at__lte=self.now + timedelta(hours=2)).exists())
+
+    def test_query_count_does_not_grow(self):
+        for user in self.users[:2]:
+            for i in range(5):
+                Habit.objects.create(user=user, name=f'Еще {i}')
+
+        # Настройки с пользователями + привычки + отметки за последние дни
+        # + резервирование в журнале (2) + статус отправки + next_fire_at
+        with self.assertNumQueries(7):
+            send_daily_reminders(now=self.now)
+
+    def test_delivery_ledger_prevents_duplicates(self):
+        self.assertEqual(send_daily_reminders(now=self.now), 2)
+        # Второй процесс с тем же окном ничего не отправляет повторно
+        self.assertEqual(send_daily_reminders(now=self.now), 0)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            set(ReminderDelivery.objects.values_list('status', flat=True)),
+            {ReminderDelivery.SENT}
+        )
+
+    def test_shards_filter_users(self):
+        shard = self.users[0].pk % 16
+        sent = send_daily_reminders(now=self.now, shards=[shard])
+
+        self.assertEqual(sent, 1)
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user0@example.com'])
+
+
+@override_settings(REMINDER_SHARDS=8, REMINDER_LEASE_TTL=60)
+class ShardCoordinatorTest(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2024, 5, 10, 9, 0, 20))
+
+    def owned(self, leases):
+        return {lease.shard for lease in leases}
+
+    def test_live_workers_split_shards(self):
+        first = ShardCoordinator('first')
+        second = ShardCoordinator('second')
+
+        first.acquire(self.now)
+        second.acquire(self.now)
+        # Первый узнает о втором и отдает ему его шарды
+        first_shards = self.owned(first.acquire(self.now))
+        second_shards = self.owned(second.acquire(self.now))
+
+        self.assertFalse(first_shards & second_shards)
+        self.assertEqual(first_shards | second_shards, set(range(8)))
+
+    def test_dead_worker_shards_are_taken_over(self):
+        first = ShardCoordinator('first')
+        second = ShardCoordinator('second')
+        first.acquire(self.now)
+        second.acquire(self.now)
+        first.acquire(self.now)
+
+        # Второй перестал отвечать: до конца аренды его шарды не трогаем
+        soon = self.now + timedelta(seconds=30)
+        self.assertNotEqual(self.owned(first.acquire(soon)), set(range(8)))
+
+        later = self.now + timedelta(seconds=61)
+        self.assertEqual(self.owned(first.acquire(later)), set(range(8)))
+
+    def test_run_wakes_up_at_next_reminder(self):
+        user = User.objects.create_user(username='late', password='testpass123', email='late@example.com')
+        user.reminder_settings.reminder_time = time(9, 10)
+        user.reminder_settings.save()
+        Habit.objects.create(user=user, name='Привычка')
+        ReminderSettings.objects.filter(user=user).update(next_fire_at=self.now - timedelta(minutes=5))
+
+        tasks._coordinator = ShardCoordinator('first')
+        try:
+            # Пропущенное новым владельцем шарда напоминание досылается
+            wake_at = run_reminder_shards(now=self.now)
+        finally:
+            tasks._coordinator = None
+
+        self.assertEqual([message.to[0] for message in mail.outbox], ['late@example.com'])
+        # Следующее напоминание в 09:10, а аренды нужно продлить раньше
+        self.assertEqual(wake_at, self.now + timedelta(seconds=20))
+
+    def test_run_sleeps_until_next_reminder(self):
+        user = User.objects.create_user(username='soon', password='testpass123', email='soon@example.com')
+        ReminderSettings.objects.filter(user=user).update(next_fire_at=self.now + timedelta(seconds=5))
+
+        tasks._coordinator = ShardCoordinator('first')
+        try:
+            wake_at = run_reminder_shards(now=self.now)
+        finally:
+            tasks._coordinator = None
+
+        self.assertEqual(wake_at, self.now + timedelta(seconds=5))
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """locmem-бэкенд, который падает на первой попытке каждого письма"""
+    attempts = {}
+
+    def send_messages(self, messages):
+        for message in messages:
+            key = message.to[0]
+            FlakyEmailBackend.attempts[key] = FlakyEmailBackend.attempts.get(key, 0) + 1
+            if FlakyEmailBackend.attempts[key] == 1 or key.startswith('broken'):
+                raise ConnectionError('SMTP недоступен')
+        return super().send_messages(messages)
+
+
+class DeliverMessagesTest(TestCase):
+    def make_messages(self, addresses):
+        return [EmailMessage('Тема', 'Текст', 'from@example.com', [address]) for address in addresses]
+
+    def test_pool_sends_all_batches(self):
+        messages = self.make_messages([f'user{i}@example.com' for i in range(25)])
+
+        sent, failed = deliver_messages(messages, workers=3, batch_size=4)
+
+        self.assertEqual((sent, failed), (25, 0))
+        self.assertEqual(len(mail.outbox), 25)
+
+    @override_settings(EMAIL_BACKEND='habits.tests.test_tasks.FlakyEmailBackend')
+    def test_retry_with_backoff(self):
+        FlakyEmailBackend.attempts = {}
+        delays = []
+        messages = self.make_messages(['ok@example.com', 'broken@example.com'])
+
+        sent, failed = send_batch(messages, max_attempts=3, backoff=0.5, sleep=delays.append)
+
+        self.assertEqual((sent, failed), (1, 1))
+        self.assertEqual(FlakyEmailBackend.attempts, {'ok@example.com': 2, 'broken@example.com': 3})
+        self.assertEqual(delays, [0.5, 0.5, 1.0])
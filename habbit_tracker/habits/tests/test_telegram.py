@@ -0,0 +1,156 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.utils import timezone
+from datetime import datetime, time
+from aiohttp import web
+from ..models import Habit, ReminderDelivery, ReminderSettings
+from ..tasks import send_daily_reminders
+from ..telegram import TelegramMessage, TokenBucket, deliver_telegram_messages
+import asyncio
+import threading
+import time as time_module
+
+
+class FakeBotAPI:
+    """
+    Локальный сервер с методом sendMessage Bot API в отдельном потоке.
+
+    Чат 'blocked' всегда отвечает 403, чат 'busy' на первый запрос
+    отвечает 429 с retry_after.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.busy_calls = 0
+        self.started = threading.Event()
+
+    async def send_message(self, request):
+        payload = await request.json()
+        self.requests.append((request.match_info['token'], payload, time_module.monotonic()))
+
+        chat_id = payload['chat_id']
+        if chat_id == 'blocked':
+            return web.json_response(
+                {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'},
+                status=403
+            )
+        if chat_id == 'busy':
+            self.busy_calls += 1
+            if self.busy_calls == 1:
+                return web.json_response(
+                    {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                     'parameters': {'retry_after': 0.1}},
+                    status=429
+                )
+        return web.json_response({'ok': True, 'result': {'chat': {'id': chat_id}, 'text': payload['text']}})
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_post('/bot{token}/sendMessage', self.send_message)
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        self.url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+        self.started.set()
+        self.loop.run_forever()
+        self.loop.run_until_complete(self.runner.cleanup())
+        self.loop.close()
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    def chat_ids(self):
+        return sorted(payload['chat_id'] for _, payload, _ in self.requests)
+
+
+class TokenBucketTest(TestCase):
+    def test_rate_is_limited_after_burst(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+
+        async def take(count):
+            for _ in range(count):
+                await bucket.acquire()
+
+        started = time_module.monotonic()
+        asyncio.run(take(15))
+        # 5 сразу из запаса, остальные 10 со скоростью 50 в секунду
+        self.assertGreaterEqual(time_module.monotonic() - started, 0.19)
+
+
+class DeliverTelegramMessagesTest(TestCase):
+    def test_concurrent_delivery(self):
+        messages = [TelegramMessage(f'chat{i}', f'Текст {i}') for i in range(40)]
+
+        with FakeBotAPI() as api:
+            sent, failed = deliver_telegram_messages(
+                messages, token='TOKEN', api_url=api.url, rate=1000, concurrency=10
+            )
+
+        self.assertEqual((sent, failed), (40, 0))
+        self.assertEqual(api.chat_ids(), sorted(f'chat{i}' for i in range(40)))
+        self.assertEqual({token for token, _, _ in api.requests}, {'TOKEN'})
+
+    def test_retry_after_and_permanent_errors(self):
+        messages = [TelegramMessage('busy', 'Текст'), TelegramMessage('blocked', 'Текст')]
+        failures = []
+
+        with FakeBotAPI() as api:
+            sent, failed = deliver_telegram_messages(
+                messages, failures=failures, token='TOKEN', api_url=api.url, rate=1000, concurrency=2
+            )
+
+        self.assertEqual((sent, failed), (1, 1))
+        self.assertEqual(failures, [messages[1]])
+        # 429 повторяется, 403 - нет
+        self.assertEqual(api.chat_ids(), ['blocked', 'busy', 'busy'])
+
+
+class TelegramRemindersTest(TestCase):
+    def setUp(self):
+        self.now = timezone.make_aware(datetime(2024, 5, 10, 9, 0, 20))
+        for i, (email, chat_id) in enumerate([(True, 'chat0'), (False, 'chat1'), (False, '')]):
+            user = User.objects.create_user(
+                username=f'user{i}',
+                password='testpass123',
+                email=f'user{i}@example.com'
+            )
+            reminder = user.reminder_settings
+            reminder.reminder_time = time(9, 0)
+            reminder.email_notifications = email
+            reminder.telegram_notifications = True
+            reminder.telegram_chat_id = chat_id
+            reminder.save()
+            Habit.objects.create(user=user, name=f'Привычка {i}')
+        ReminderSettings.objects.update(next_fire_at=self.now.replace(second=0))
+
+    def test_reminders_sent_to_both_channels(self):
+        with FakeBotAPI() as api:
+            with override_settings(TELEGRAM_BOT_TOKEN='TOKEN', TELEGRAM_API_URL=api.url):
+                sent = send_daily_reminders(now=self.now)
+                # Повторный запуск не дублирует сообщения
+                send_daily_reminders(now=self.now)
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(api.chat_ids(), ['chat0', 'chat1'])
+        self.assertIn('Привычка 1', api.requests[0][1]['text'] + api.requests[1][1]['text'])
+        self.assertEqual([message.to[0] for message in mail.outbox], ['user0@example.com'])
+        self.assertEqual(
+            ReminderDelivery.objects.filter(channel=ReminderDelivery.TELEGRAM, status=ReminderDelivery.SENT).count(),
+            2
+        )
+
+    def test_telegram_skipped_without_token(self):
+        sent = send_daily_reminders(now=self.now)
+
+        self.assertEqual(sent, 1)
+        self.assertFalse(ReminderDelivery.objects.filter(channel=ReminderDelivery.TELEGRAM).exists())
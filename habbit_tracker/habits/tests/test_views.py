@@ -1,7 +1,7 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
-from ..models import Habit, HabitLog
+from ..models import Achievement, Habit, HabitLog
 from datetime import timedelta
 from django.utils import timezone
 
@@ -49,9 +49,10 @@ class HabitViewsTest(TestCase):
     def test_log_habit_view(self):
         url = reverse('log_habit', args=[self.habit.id])
 
-        # GET запрос
+        # GET запрос не создает отметку и не обрывает серию
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+        self.assertFalse(HabitLog.objects.exists())
 
         # POST запрос
         data = {'completed': True, 'notes': 'Тест'}
@@ -94,10 +95,47 @@ class HabitViewsTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'habits/statistics.html')
+        self.assertEqual(len(response.context['dates']), 30)
+        self.assertEqual(response.context['completed_data'][-5:], [1, 0, 1, 0, 1])
+        self.assertEqual(response.context['streak_data'][-3:], [1, 0, 1])
+        self.assertEqual(response.context['completed_days'], 3)
+        self.assertEqual(response.context['best_streak'], 1)
+        self.assertEqual(len(response.context['weekly_stats']), 5)
+
+        response = self.client.get(url, {'days': 7})
+        self.assertEqual(response.context['total_days'], 7)
+        self.assertEqual(len(response.context['dates']), 7)
 
     def test_dashboard_view(self):
         url = reverse('dashboard')
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'habits/dashboard.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'habits/dashboard.html')
+
+    def test_public_achievements_view(self):
+        Achievement.objects.create(
+            user=self.user, habit=self.habit, title='Неделя', description='', streak_length=7, is_public=True
+        )
+        response = self.client.get(reverse('public_achievements'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'habits/public_achievements.html')
+        self.assertContains(response, 'Неделя')
+        self.assertEqual(response.context['top_users'][0]['user__username'], 'testuser')
+
+    def test_index_and_dashboard_query_count_does_not_grow(self):
+        today = timezone.now().date()
+        for i in range(10):
+            habit = Habit.objects.create(user=self.user, name=f'Привычка {i}')
+            HabitLog.objects.create(habit=habit, date=today, completed=(i % 2 == 0))
+
+        # Сессия + пользователь + привычки + сегодняшние отметки
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Сегодня выполнено')
+        self.assertContains(response, 'Сегодня не выполнено')
+
+        # Сессия + пользователь + привычки с агрегатами
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(len(response.context['stats']), 11)
@@ -0,0 +1,79 @@
+"""Лента выполнения привычки по дням для статистики"""
+from datetime import timedelta
+from django.utils import timezone
+from .bitmaps import load_day_bits, iter_days
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+
+def parse_days(value, default=DEFAULT_DAYS):
+    """Длина окна из параметра запроса, ограниченная разумными пределами"""
+    try:
+        days = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(days, 1), MAX_DAYS)
+
+
+class HabitTimeline:
+    """
+    Отметки привычки за последние days дней в виде плотного массива.
+
+    Отметки окна читаются из годовых битовых карт одним запросом,
+    серии и недельная статистика считаются за один проход по дням.
+    """
+
+    def __init__(self, habit, days=DEFAULT_DAYS, end_date=None):
+        self.habit = habit
+        self.days = days
+        self.end_date = end_date or timezone.now().date()
+        # Окно включает end_date, поэтому в нём ровно days дней
+        self.start_date = self.end_date - timedelta(days=days - 1)
+
+        self.bits = load_day_bits(habit, self.start_date, self.end_date)
+        self.best_streak = self.bits.longest_run()
+
+        self.dates = []
+        self.completed = []
+        self.streaks = []
+        self.weeks = []
+
+        current_streak = 0
+        for offset, (date, _, is_completed) in enumerate(iter_days(self.bits)):
+            current_streak = current_streak + 1 if is_completed else 0
+
+            self.dates.append(date)
+            self.completed.append(1 if is_completed else 0)
+            self.streaks.append(current_streak)
+
+            if offset % 7 == 0:
+                self.weeks.append({'completed': 0, 'total': 0})
+            self.weeks[-1]['completed'] += self.completed[-1]
+            self.weeks[-1]['total'] += 1
+
+    @property
+    def completed_days(self):
+        return self.bits.count_completed()
+
+    @property
+    def completion_rate(self):
+        """Процент выполнения относительно длины окна"""
+        return round((self.completed_days / self.days) * 100)
+
+    def daily_data(self):
+        return [
+            {'date': date, 'completed': bool(completed), 'streak': streak}
+            for date, completed, streak in zip(self.dates, self.completed, self.streaks)
+        ]
+
+    def weekly_stats(self):
+        return [
+            {
+                'week': f"Неделя {number}",
+                'completed': week['completed'],
+                'total': week['total'],
+                'percentage': round((week['completed'] / week['total']) * 100),
+            }
+            for number, week in enumerate(self.weeks, start=1)
+        ]
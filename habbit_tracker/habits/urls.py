@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from .views import reminder_settings_view
+from .metrics_views import metrics_view
 from .social_views import achievements_list, public_achievements, share_achievement
 
 urlpatterns = [
@@ -14,4 +15,5 @@ urlpatterns = [
     path('achievements/', achievements_list, name='achievements_list'),
     path('achievements/public/', public_achievements, name='public_achievements'),
     path('achievements/<int:achievement_id>/share/', share_achievement, name='share_achievement'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -2,10 +2,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.db.models import Prefetch
 from datetime import timedelta
+from zoneinfo import ZoneInfo
 from .models import Habit, HabitLog
 from .forms import HabitForm, HabitLogForm
 from .reminder_forms import ReminderSettingsForm
+from .timeline import HabitTimeline, parse_days
+from .bitmaps import load_day_bits, iter_days
 
 
 @login_required
@@ -29,7 +33,9 @@ def reminder_settings_view(request):
     context = {
         'form': form,
         'active_habits_count': Habit.objects.filter(user=request.user, is_active=True).count(),
-        'next_reminder_time': settings.reminder_time if settings.enabled else None,
+        'next_reminder_time': (
+            settings.next_fire_at.astimezone(ZoneInfo(settings.timezone)) if settings.next_fire_at else None
+        ),
         # В реальном приложении здесь нужно получить время последней отправки
         'last_sent': None,  # Заглушка, можно получить из логов
     }
@@ -39,17 +45,16 @@ def reminder_settings_view(request):
 @login_required
 def index(request):
     """Главная страница со списком привычек"""
-    habits = Habit.objects.filter(user=request.user, is_active=True)
-
     # Получаем сегодняшнюю дату
     today = timezone.now().date()
 
-    # Для каждой привычки проверяем, есть ли отметка на сегодня
+    # Сегодняшние отметки всех привычек подгружаем одним запросом
+    habits = Habit.objects.filter(user=request.user, is_active=True).prefetch_related(
+        Prefetch('logs', queryset=HabitLog.objects.filter(date=today), to_attr='today_logs')
+    )
+
     for habit in habits:
-        habit.today_log = HabitLog.objects.filter(
-            habit=habit,
-            date=today
-        ).first()
+        habit.today_log = habit.today_logs[0] if habit.today_logs else None
 
     return render(request, 'habits/index.html', {'habits': habits, 'today': today})
 
@@ -77,12 +82,12 @@ def log_habit(request, habit_id):
     habit = get_object_or_404(Habit, id=habit_id, user=request.user)
     today = timezone.now().date()
 
-    # Получаем или создаем запись на сегодня
-    log, created = HabitLog.objects.get_or_create(
-        habit=habit,
-        date=today,
-        defaults={'completed': False}
-    )
+    # Запись на сегодня создается только при отправке формы: просмотр страницы
+    # не должен отмечать день пропущенным и обрывать серию
+    log = HabitLog.objects.filter(habit=habit, date=today).first()
+    if log is None:
+        log = HabitLog(date=today, completed=False)
+    log.habit = habit
 
     if request.method == 'POST':
         form = HabitLogForm(request.POST, instance=log)
@@ -101,27 +106,15 @@ def calendar_view(request, habit_id):
     """Календарь выполнения привычки"""
     habit = get_object_or_404(Habit, id=habit_id, user=request.user)
 
-    # Получаем логи за последние 30 дней
+    # Отметки за последние 30 дней из годовых битовых карт
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=30)
 
-    logs = HabitLog.objects.filter(
-        habit=habit,
-        date__range=[start_date, end_date]
-    ).order_by('date')
-
-    # Создаем словарь для удобства отображения
-    log_dict = {log.date: log for log in logs}
-
-    # Генерируем список дней
-    days = []
-    current_date = start_date
-    while current_date <= end_date:
-        days.append({
-            'date': current_date,
-            'log': log_dict.get(current_date)
-        })
-        current_date += timedelta(days=1)
+    # Шаблону нужен только статус дня, поэтому вместо логов передаем словари
+    days = [
+        {'date': date, 'log': {'completed': completed} if marked else None}
+        for date, marked, completed in iter_days(load_day_bits(habit, start_date, end_date))
+    ]
 
     return render(request, 'habits/calendar.html', {
         'habit': habit,
@@ -133,65 +126,19 @@ def statistics_view(request, habit_id):
     """Детальная статистика привычки с графиками"""
     habit = get_object_or_404(Habit, id=habit_id, user=request.user)
 
-    # Данные за последние 30 дней
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=30)
-
-    logs = HabitLog.objects.filter(
-        habit=habit,
-        date__range=[start_date, end_date]
-    ).order_by('date')
-
-    # Подготовка данных для графиков
-    dates = []
-    completed_data = []
-    streak_data = []
-
-    current_streak = 0
-    current_date = start_date
-
-    while current_date <= end_date:
-        log = logs.filter(date=current_date).first()
-        is_completed = log.completed if log else False
-
-        dates.append(current_date.strftime('%d.%m'))
-        completed_data.append(1 if is_completed else 0)
-
-        if is_completed:
-            current_streak += 1
-        else:
-            current_streak = 0
-
-        streak_data.append(current_streak)
-        current_date += timedelta(days=1)
-
-    # Еженедельная статистика
-    weekly_stats = []
-    for i in range(0, len(dates), 7):
-        week_dates = dates[i:i+7]
-        week_completed = completed_data[i:i+7]
-        weekly_stats.append({
-            'week': f"Неделя {i//7 + 1}",
-            'completed': sum(week_completed),
-            'total': len(week_dates),
-            'percentage': round((sum(week_completed) / len(week_dates)) * 100) if week_dates else 0
-        })
-
-    # Общая статистика
-    total_days = 30
-    completed_days = sum(completed_data)
-    completion_rate = round((completed_days / total_days) * 100)
+    # Данные за последние N дней (по умолчанию 30) одним запросом
+    timeline = HabitTimeline(habit, days=parse_days(request.GET.get('days')))
 
     context = {
         'habit': habit,
-        'dates': dates,
-        'completed_data': completed_data,
-        'streak_data': streak_data,
-        'weekly_stats': weekly_stats,
-        'total_days': total_days,
-        'completed_days': completed_days,
-        'completion_rate': completion_rate,
-        'best_streak': max(streak_data) if streak_data else 0,
+        'dates': [date.strftime('%d.%m') for date in timeline.dates],
+        'completed_data': timeline.completed,
+        'streak_data': timeline.streaks,
+        'weekly_stats': timeline.weekly_stats(),
+        'total_days': timeline.days,
+        'completed_days': timeline.completed_days,
+        'completion_rate': timeline.completion_rate,
+        'best_streak': timeline.best_streak,
     }
 
     return render(request, 'habits/statistics.html', context)
@@ -200,12 +147,12 @@ def statistics_view(request, habit_id):
 @login_required
 def dashboard_view(request):
     """Общая статистика всех привычек"""
-    habits = Habit.objects.filter(user=request.user, is_active=True)
+    habits = Habit.objects.filter(user=request.user, is_active=True).with_log_stats()
 
     stats = []
     for habit in habits:
         completion_rate = habit.get_completion_percentage()
-        current_streak = habit.get_current_streak()
+        current_streak = habit.current_streak
 
         stats.append({
             'habit': habit,